@@ -1,12 +1,17 @@
 import logging
 from fastapi import APIRouter, HTTPException
+from typing import Optional
 from pydantic import BaseModel
-from parsers.pdf_extractor import extract_pages
-from parsers.layout_model import detect_layout
-from parsers.layout_heuristics import build_blocks_and_roles, build_reading_order
-from parsers.normalize import normalize_blocks
-from parsers.profiles import apply_profile
-from database import DOC_DATA
+from parsers.pdf_extractor import page_count
+from parsers.pipeline import run_pipeline, iter_page_results
+from core.config import UPLOAD_DIR, PARSE_CACHE_ENABLED, PRERENDER_AFTER_PARSE, parser_fingerprint
+from core.hashing import sha256_file
+from core.jobs import PARSE_JOBS, ParseJob
+from core.metrics import PARSE_REQUESTS, PARSE_STAGE_SECONDS
+from core.sentence_index import build_sentence_index
+from database import DOC_STORE, PARSE_CACHE, UPLOADS
+from tts import cache as audio_cache
+from tts.prerender import PRERENDER
 
 router = APIRouter()
 
@@ -14,34 +19,139 @@ class ParseRequest(BaseModel):
     file_id: str
     profile: str = "academic"
     include_captions: bool = False
+    # Pre-render the doc's audio in the background; None uses PRERENDER_AFTER_PARSE
+    prerender: Optional[bool] = None
+
+def _content_hash(file_id: str):
+    """sha256 of an uploaded file; recorded at upload time, computed lazily otherwise."""
+    sha = UPLOADS.sha256_for(file_id)
+    if sha is None:
+        file_path = UPLOAD_DIR / f"{file_id}.pdf"
+        if not file_path.exists():
+            return None
+        sha = sha256_file(file_path)
+        UPLOADS.record(file_id, sha, file_path.stat().st_size)
+    return sha
+
+def _parse_cache_key(sha: str, req: ParseRequest) -> str:
+    return f"{sha}:{parser_fingerprint()}:{req.profile}:{int(req.include_captions)}"
+
+def _cached_result(req: ParseRequest):
+    """Returns (cached doc or None, cache key or None)."""
+    if not PARSE_CACHE_ENABLED:
+        return None, None
+    sha = _content_hash(req.file_id)
+    if sha is None:
+        return None, None
+    cache_key = _parse_cache_key(sha, req)
+    cached = PARSE_CACHE.get(cache_key)
+    if cached is not None:
+        logging.info(f"Parse cache hit for {req.file_id} ({sha[:12]})")
+        cached = {**cached, "doc_id": req.file_id}
+        # Fresh index: picks up audio cached since the parse, and is not shared between docs.
+        cached["sentence_index"] = build_sentence_index(cached, audio_cache.duration_ms)
+    return cached, cache_key
+
+def _store_result(doc_result: dict, cache_key) -> None:
+    with PARSE_STAGE_SECONDS.time(stage="build_sentence_index"):
+        doc_result["sentence_index"] = build_sentence_index(doc_result, audio_cache.duration_ms)
+    DOC_STORE.put(doc_result["doc_id"], doc_result)
+    if cache_key is not None:
+        PARSE_CACHE.put(cache_key, doc_result)
+
+def _maybe_prerender(req: ParseRequest, doc: dict) -> None:
+    if req.prerender if req.prerender is not None else PRERENDER_AFTER_PARSE:
+        PRERENDER.submit(doc)
 
 @router.post("/parse")
 def parse(req: ParseRequest):
     try:
-        pages = extract_pages(req.file_id)
-        if not pages:
+        cached, cache_key = _cached_result(req)
+        if cached is not None:
+            DOC_STORE.put(req.file_id, cached)
+            PARSE_REQUESTS.inc(outcome="cache_hit")
+            _maybe_prerender(req, cached)
+            return cached
+
+        result = run_pipeline(req.file_id, req.profile, req.include_captions)
+        if result is None:
+            PARSE_REQUESTS.inc(outcome="not_found")
             raise HTTPException(status_code=404, detail="PDF file not found or failed to extract pages.")
-            
-        layout = detect_layout(pages)
-        blocks = build_blocks_and_roles(pages, layout)
-        blocks = normalize_blocks(blocks)
-        blocks = apply_profile(
-            blocks, 
-            profile=req.profile,
-            include_captions=req.include_captions
-        )
-        order = build_reading_order(blocks)
-        
+        blocks, order = result
+
         doc_id = req.file_id
         doc_result = {
             "doc_id": doc_id,
             "blocks": blocks,
             "reading_order": order
         }
-        
-        DOC_DATA[doc_id] = doc_result
-        
+
+        _store_result(doc_result, cache_key)
+        PARSE_REQUESTS.inc(outcome="parsed")
+        _maybe_prerender(req, doc_result)
+
         return doc_result
+    except HTTPException:
+        raise
     except Exception as e:
+        PARSE_REQUESTS.inc(outcome="error")
         logging.exception("An error occurred during the parsing process.")
-        raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
+
+def _run_parse_job(job: ParseJob, req: ParseRequest) -> None:
+    cached, cache_key = _cached_result(req)
+    if cached is not None:
+        # Republish page by page so partial-result cursors behave the same.
+        job.total_pages = 1 + max((b["page"] for b in cached["blocks"]), default=-1)
+        by_page = {p: ([], []) for p in range(job.total_pages)}
+        page_of = {}
+        for b in cached["blocks"]:
+            by_page[b["page"]][0].append(b)
+            page_of[b["id"]] = b["page"]
+        for block_id in cached["reading_order"]:
+            by_page[page_of[block_id]][1].append(block_id)
+        for p in range(job.total_pages):
+            job.publish_page(*by_page[p])
+        DOC_STORE.put(req.file_id, cached)
+        PARSE_REQUESTS.inc(outcome="cache_hit")
+        _maybe_prerender(req, cached)
+        return
+
+    job.total_pages = page_count(req.file_id)
+    for _, blocks, order in iter_page_results(req.file_id, req.profile, req.include_captions):
+        job.publish_page(blocks, order)
+
+    doc_result = {
+        "doc_id": job.doc_id,
+        "blocks": list(job.doc["blocks"]),
+        "reading_order": list(job.doc["reading_order"]),
+    }
+    _store_result(doc_result, cache_key)
+    PARSE_REQUESTS.inc(outcome="parsed")
+    _maybe_prerender(req, doc_result)
+
+@router.post("/parse/jobs", status_code=202)
+def submit_parse_job(req: ParseRequest):
+    """
+    Starts a background parse and returns immediately. Pages are published as
+    they finish; /api/stream can start on the doc_id before the job is done.
+    """
+    if not (UPLOAD_DIR / f"{req.file_id}.pdf").exists():
+        raise HTTPException(status_code=404, detail="PDF file not found.")
+    job = PARSE_JOBS.submit(req.file_id, lambda j: _run_parse_job(j, req))
+    return job.summary()
+
+@router.get("/parse/jobs/{job_id}")
+def get_parse_job(job_id: str):
+    job = PARSE_JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job_id: {job_id}")
+    return job.summary()
+
+@router.get("/parse/jobs/{job_id}/result")
+def get_parse_job_result(job_id: str, from_page: int = 0):
+    """Blocks and reading order published so far, starting at `from_page`."""
+    job = PARSE_JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job_id: {job_id}")
+    return job.partial(from_page)
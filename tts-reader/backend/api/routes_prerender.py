@@ -0,0 +1,30 @@
+from fastapi import APIRouter, HTTPException
+from database import DOC_STORE
+from tts.prerender import PRERENDER
+
+router = APIRouter()
+
+@router.post("/prerender/{doc_id}", status_code=202)
+def start_prerender(doc_id: str):
+    """
+    Renders every readable sentence of a parsed doc into the audio cache in
+    the background, at lower priority than live streams.
+    """
+    doc = DOC_STORE.get(doc_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail=f"Unknown doc_id: {doc_id}")
+    return PRERENDER.submit(doc).summary()
+
+@router.get("/prerender/{doc_id}")
+def get_prerender(doc_id: str):
+    job = PRERENDER.get(doc_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No pre-render for doc_id: {doc_id}")
+    return job.summary()
+
+@router.delete("/prerender/{doc_id}")
+def cancel_prerender(doc_id: str):
+    job = PRERENDER.cancel(doc_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No pre-render for doc_id: {doc_id}")
+    return job.summary()
@@ -1,12 +1,43 @@
+import asyncio
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from tts.engine import TTS
+from starlette.concurrency import run_in_threadpool
+from starlette.websockets import WebSocketState
+from tts.engine import TTS_ENGINE
 from tts.stream import stream_sentences
-from database import DOC_DATA
+from tts import cache as audio_cache
+from database import DOC_STORE
+from core.jobs import PARSE_JOBS
+from core.sentence_index import refresh_durations
 import logging
 
 router = APIRouter()
-tts_engine = TTS()
+tts_engine = TTS_ENGINE
 log = logging.getLogger(__name__)
+_refreshing = {}  # doc_id -> task refreshing its stored time offsets
+
+def _refresh_offsets(doc_id: str, doc: dict) -> None:
+    """Stores the doc again with audio durations cached since its index was built."""
+    index = doc.get("sentence_index")
+    if index is None or "ends_ms" not in index:
+        return
+    refreshed = refresh_durations(doc, index, audio_cache.duration_ms)
+    current = DOC_STORE.get(doc_id)
+    # Skip if the doc was re-parsed meanwhile.
+    if refreshed is not None and current is not None and current.get("sentence_index") == index:
+        DOC_STORE.put(doc_id, {**doc, "sentence_index": refreshed})
+
+def _schedule_refresh(doc_id: str, doc: dict) -> None:
+    index = doc.get("sentence_index")
+    if not index or not index.get("estimated") or doc_id in _refreshing:
+        return
+    task = _refreshing[doc_id] = asyncio.create_task(asyncio.to_thread(_refresh_offsets, doc_id, doc))
+
+    def done(t):
+        _refreshing.pop(doc_id, None)
+        if not t.cancelled() and t.exception() is not None:
+            log.warning("Offset refresh for %s failed: %s", doc_id, t.exception())
+
+    task.add_done_callback(done)
 
 @router.websocket("/stream")
 async def stream(ws: WebSocket):
@@ -21,15 +52,27 @@ async def stream(ws: WebSocket):
                 return
 
         doc_id = cfg.get("doc_id")
-        if not doc_id or doc_id not in DOC_DATA:
+        # A hot-tier miss reads and decodes the doc from SQLite: keep it off the loop.
+        doc_data = await run_in_threadpool(DOC_STORE.get, doc_id) if doc_id else None
+        job = None
+        if doc_data is None and doc_id:
+            # Still parsing: stream published pages and wait for the rest.
+            job = PARSE_JOBS.active_for_doc(doc_id)
+            doc_data = job.doc if job else await run_in_threadpool(DOC_STORE.get, doc_id)
+        if doc_data is None:
             await ws.close(code=1008, reason=f"Unknown doc_id: {doc_id}")
             return
 
         await ws.send_json({"type": "ready", "doc_id": doc_id})
+        if job is None and cfg.get("start_ms") is not None:
+            # This seek used estimates for uncached sentences; later seeks get real durations.
+            _schedule_refresh(doc_id, doc_data)
 
-        await stream_sentences(ws, tts_engine, DOC_DATA[doc_id], cfg)
+        connected = await stream_sentences(ws, tts_engine, doc_data, cfg, job=job)
 
-        await ws.close(code=1000, reason="done")
+        # After a disconnect, close() would send an unexpected websocket.close.
+        if connected and WebSocketState.DISCONNECTED not in (ws.client_state, ws.application_state):
+            await ws.close(code=1000, reason="done")
 
     except WebSocketDisconnect:
         log.info("Client disconnected")
@@ -39,3 +82,17 @@ async def stream(ws: WebSocket):
             await ws.close(code=1011, reason="internal error")
         except Exception:
             pass
+
+@router.get("/tts/stats")
+def tts_stats():
+    """
+    Provider gateway counters (calls, 429s, retries, queue depth, cooldown)
+    and single-flight counters: provider calls started, callers coalesced
+    onto an in-flight call (= provider calls saved), calls in flight now.
+    """
+    return tts_engine.stats()
+
+@router.get("/audio-cache/stats")
+def audio_cache_stats():
+    """Hit/miss/eviction counters and tier sizes for the audio cache."""
+    return audio_cache.stats()
@@ -1,12 +1,30 @@
+import hashlib
+import os
 import uuid
-from fastapi import FastAPI, UploadFile, File
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
 
+from api.routes_metrics import router as metrics_router
 from api.routes_parse import router as parse_router
+from api.routes_prerender import router as prerender_router
 from api.routes_stream import router as stream_router
-from core.config import UPLOAD_DIR
+from core.config import UPLOAD_DIR, UPLOAD_BLOB_DIR, MAX_UPLOAD_BYTES, UPLOAD_CHUNK_BYTES, STARTUP_WARMUP
+from database import UPLOADS
+from parsers.pipeline import warmup
 
-app = FastAPI(title="Layout-Aware TTS Reader")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Heavy parse dependencies load lazily; STARTUP_WARMUP loads them before
+    # the first request is accepted instead.
+    if STARTUP_WARMUP:
+        await run_in_threadpool(warmup, STARTUP_WARMUP)
+    yield
+
+app = FastAPI(title="Layout-Aware TTS Reader", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,13 +34,132 @@ app.add_middleware(
 
 app.include_router(parse_router, prefix="/api")
 app.include_router(stream_router, prefix="/api")
+app.include_router(prerender_router, prefix="/api")
+app.include_router(metrics_router, prefix="/api")
+
+def _store_upload(tmp_path, file_path, file_id: str, sha256: str, size: int) -> None:
+    """
+    Stores a finished upload under its own file_id, sharing the bytes with
+    any earlier upload of the same content. Every upload gets a fresh
+    file_id (and so its own doc_id); only the blob is deduplicated.
+    """
+    blob_path = UPLOAD_BLOB_DIR / f"{sha256}.pdf"
+    try:
+        # link() fails if the blob exists, so of two identical uploads racing
+        # here exactly one becomes the blob (an insert-or-ignore on the hash).
+        os.link(tmp_path, blob_path)
+    except FileExistsError:
+        pass
+    except OSError:
+        # No hard links on this filesystem: keep a private copy.
+        os.replace(tmp_path, file_path)
+        UPLOADS.record(file_id, sha256, size)
+        return
+    os.link(blob_path, file_path)
+    UPLOADS.record(file_id, sha256, size)
+
+# Room for the multipart boundaries and part headers around the file itself.
+_MULTIPART_OVERHEAD = 64 * 1024
+
+class _FilePart:
+    """python-multipart callbacks that keep the data of the first "file" part."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+        self.found = False
+        self._in_file = False
+        self._field = self._value = self._disposition = b""
+
+    def on_part_begin(self):
+        self._in_file = False
+        self._disposition = b""
+
+    def on_header_field(self, data, start, end):
+        self._field += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def on_header_end(self):
+        if self._field.lower() == b"content-disposition":
+            self._disposition = self._value
+        self._field = self._value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        self._in_file = not self.found and options.get(b"name") == b"file"
+        self.found = self.found or self._in_file
+
+    def on_part_data(self, data, start, end):
+        if self._in_file:
+            self.chunks.append(bytes(data[start:end]))
+            self.size += end - start
+
+    def callbacks(self) -> dict:
+        return {name: getattr(self, name) for name in (
+            "on_part_begin", "on_header_field", "on_header_value", "on_header_end",
+            "on_headers_finished", "on_part_data")}
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File exceeds {MAX_UPLOAD_BYTES} bytes.")
+
+async def _receive_file(request: Request, tmp_path) -> tuple:
+    """
+    Streams the "file" part of a multipart upload from the request body
+    straight into `tmp_path`, hashing as it goes. MAX_UPLOAD_BYTES is
+    enforced on the bytes actually received, before anything is spooled.
+    Returns (sha256 hex digest, file size).
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload.")
+    part = _FilePart()
+    parser = MultipartParser(options[b"boundary"], part.callbacks())
+    sha = hashlib.sha256()
+    received = 0
+    with open(tmp_path, "wb") as buffer:
+
+        async def flush():
+            data = b"".join(part.chunks)
+            part.chunks.clear()
+            sha.update(data)
+            await run_in_threadpool(buffer.write, data)
+
+        try:
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > MAX_UPLOAD_BYTES + _MULTIPART_OVERHEAD:
+                    raise _too_large()
+                parser.write(chunk)
+                if part.size > MAX_UPLOAD_BYTES:
+                    raise _too_large()
+                # Batch small network reads into UPLOAD_CHUNK_BYTES writes.
+                if sum(map(len, part.chunks)) >= UPLOAD_CHUNK_BYTES:
+                    await flush()
+            parser.finalize()
+        except MultipartParseError as e:
+            raise HTTPException(status_code=400, detail=f"Malformed upload: {e}")
+        await flush()
+    if not part.found:
+        raise HTTPException(status_code=400, detail='Missing "file" field.')
+    return sha.hexdigest(), part.size
 
 @app.post("/api/upload")
-async def upload(file: UploadFile = File(...)):
+async def upload(request: Request):
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES + _MULTIPART_OVERHEAD:
+        raise _too_large()
+
     file_id = str(uuid.uuid4())
     file_path = UPLOAD_DIR / f"{file_id}.pdf"
-    
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
+    tmp_path = UPLOAD_DIR / f".{file_id}.part"
+
+    # The body goes to disk once, as it arrives; the file is never spooled or copied.
+    try:
+        sha256, size = await _receive_file(request, tmp_path)
+        await run_in_threadpool(_store_upload, tmp_path, file_path, file_id, sha256, size)
+    finally:
+        await run_in_threadpool(tmp_path.unlink, missing_ok=True)
 
     return {"file_id": file_id}
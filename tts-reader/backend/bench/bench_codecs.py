@@ -0,0 +1,88 @@
+"""
+Wire codec benchmark: bytes per second, encode cost and fidelity per codec.
+
+    python -m bench.bench_codecs [--seconds 30] [--json out.json]
+
+Run from tts-reader/backend. The input is a synthetic speech-like signal
+(voiced harmonics under moving formants, with pauses and noise bursts) at
+the canonical 48 kHz PCM16. SNR is measured after decoding, against the
+input band-limited the same way, so it reflects quantization/coding loss
+rather than the intended sample-rate reduction. Opus is included only when
+opuslib is installed; its SNR is indicative only (encoder delay, perceptual
+coding).
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from tts.codecs import CODECS, SOURCE_SR, _decimate
+
+
+def speech_like(seconds: float, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SOURCE_SR)) / SOURCE_SR
+    f0 = 120 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / SOURCE_SR
+    formants = [(500, 1500), (1500, 2500), (2500, 3500)]
+    voiced = np.zeros_like(t)
+    for h in range(1, 30):
+        freq = h * f0
+        gain = sum(np.exp(-((freq - lo - (hi - lo) * (0.5 + 0.5 * np.sin(2 * np.pi * 0.3 * t * (i + 1)))) / 300) ** 2)
+                   for i, (lo, hi) in enumerate(formants))
+        voiced += gain * np.sin(h * phase) / h
+    syllables = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)
+    pauses = (np.sin(2 * np.pi * 0.25 * t) > -0.7).astype(float)
+    noise = rng.normal(0, 0.05, t.size) * (syllables < 0.2)
+    signal = (voiced / np.abs(voiced).max() * syllables + noise) * pauses
+    return np.clip(signal * 12000, -32768, 32767).astype(np.int16)
+
+
+def _snr_db(reference: np.ndarray, decoded: np.ndarray):
+    """None when lossless."""
+    n = min(reference.size, decoded.size)
+    ref = reference[:n].astype(np.float64)
+    err = np.sum((ref - decoded[:n].astype(np.float64)) ** 2)
+    return round(float(10 * np.log10(np.sum(ref ** 2) / err)), 1) if err else None
+
+
+def run(seconds: float):
+    pcm = speech_like(seconds)
+    results = []
+    for name, codec in CODECS.items():
+        t0 = time.perf_counter()
+        payload = codec.encode(pcm)
+        encode_s = time.perf_counter() - t0
+        reference = _decimate(pcm, codec.factor)
+        results.append({
+            "codec": name,
+            "sample_rate": codec.sample_rate,
+            "bytes_per_s": round(payload.nbytes / seconds),
+            "kbps": round(payload.nbytes * 8 / seconds / 1000, 1),
+            "vs_pcm16": round(payload.nbytes / pcm.nbytes, 4),
+            "encode_ms_per_audio_s": round(encode_s / seconds * 1000, 3),
+            "snr_db": _snr_db(reference, codec.decode(payload)),
+            "messages_per_s": round(sum(1 for _ in codec.frames(payload)) / seconds, 1),
+        })
+    for r in results:
+        print(f"{r['codec']:<10} {r['sample_rate']:>6} Hz  {r['kbps']:>7.1f} kbps  "
+              f"{r['vs_pcm16']:>6.1%} of pcm16  encode {r['encode_ms_per_audio_s']:>6.2f} ms/s  "
+              + (f"SNR {r['snr_db']:>5.1f} dB" if r["snr_db"] is not None else "lossless"))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark stream wire codecs.")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path.")
+    args = parser.parse_args()
+
+    results = run(args.seconds)
+    if args.json:
+        args.json.write_text(json.dumps({"benchmark": "codecs", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Page extraction benchmark: serial vs. process-pool extract_pdf across page counts.
+
+    python -m bench.bench_extract --pages 50 200 400 --workers 1 2 4 [--json out.json]
+    python -m bench.bench_extract --memory --pages 200
+
+
+Run from tts-reader/backend. Each configuration is timed --repeat times and
+the best wall time is reported; the pool is warmed up before timing so
+process startup is not counted.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from bench.synthetic_pdf import make_pdf
+from parsers import pdf_extractor
+from parsers.pdf_extractor import extract_pdf
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run(page_counts, worker_counts, repeat: int, columns: int):
+    # Force the pool path for every worker count > 1 so small docs are measured too.
+    pdf_extractor.EXTRACT_PARALLEL_MIN_PAGES = 1
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in page_counts:
+            path = make_pdf(Path(tmp) / f"bench_{pages}.pdf", pages, columns=columns)
+            baseline = None
+            for workers in worker_counts:
+                if workers > 1:
+                    extract_pdf(path, workers)  # warm the pool
+                seconds = _time(lambda: extract_pdf(path, workers), repeat)
+                baseline = baseline or seconds
+                results.append({
+                    "pages": pages,
+                    "workers": workers,
+                    "seconds": round(seconds, 4),
+                    "pages_per_s": round(pages / seconds, 1),
+                    "speedup": round(baseline / seconds, 2),
+                })
+                r = results[-1]
+                print(f"{pages:>6} pages  {workers:>2} workers  {r['seconds']:>8.3f}s  "
+                      f"{r['pages_per_s']:>8.1f} p/s  x{r['speedup']}")
+    return results
+
+
+def run_memory(page_counts, columns: int):
+    """Serial extraction: time per page and peak traced memory of the page list."""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in page_counts:
+            path = make_pdf(Path(tmp) / f"bench_{pages}.pdf", pages, columns=columns)
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            extracted = extract_pdf(path, 1)
+            seconds = time.perf_counter() - t0
+            retained, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del extracted
+            results.append({
+                "pages": pages,
+                "ms_per_page": round(seconds / pages * 1000, 3),
+                "peak_mib": round(peak / 2**20, 2),
+                "retained_mib": round(retained / 2**20, 2),
+            })
+            r = results[-1]
+            print(f"{pages:>6} pages  {r['ms_per_page']:>7.2f} ms/page  "
+                  f"peak {r['peak_mib']:>8.2f} MiB  retained {r['retained_mib']:>8.2f} MiB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel page extraction.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200, 400])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--columns", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--memory", action="store_true",
+                        help="Measure time per page and peak memory of serial extraction instead.")
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path.")
+    args = parser.parse_args()
+
+    if args.memory:
+        results = run_memory(args.pages, args.columns)
+        name = "extract_memory"
+    else:
+        print(f"CPU count: {os.cpu_count()}")
+        results = run(args.pages, args.workers, args.repeat, args.columns)
+        name = "extract"
+    if args.json:
+        args.json.write_text(json.dumps({"benchmark": name, "cpu_count": os.cpu_count(),
+                                         "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Parse pipeline benchmark: wall time, CPU time and peak memory per stage.
+
+    python -m bench.bench_parse [--pages 1 10 100] [--columns 1 2 3] [--density dense sparse]
+                                [--repeat 3] [--no-memory] [--json out.json]
+
+Run from tts-reader/backend. Each configuration is a synthetic PDF
+(bench.synthetic_pdf) run through the code /api/parse runs, in order:
+extract_pages (pdf_extractor.extract_pdf, OCR of scanned pages included),
+the stages of parsers.pipeline.page_stages (detect_boilerplate,
+detect_layout, build_blocks_and_roles, normalize_blocks, apply_profile,
+build_reading_order), and build_sentence_index. The spaCy model is loaded
+once up front and reported as setup, not as normalize time.
+
+Timings are the best of --repeat runs. CPU is process time of this process
+only: with EXTRACT_WORKERS > 1, extraction work done in the process pool is
+not counted. Peak memory per stage comes from a separate tracemalloc pass
+(tracing slows everything down, so it is not mixed into the timings) and is
+the highest traced Python allocation while the stage ran, above what was
+already allocated when it started.
+
+The JSON output has sorted keys, a fixed stage list and results sorted by
+(columns, density, pages), so two runs can be diffed directly.
+"""
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from bench.synthetic_pdf import make_pdf
+from core.sentence_index import build_sentence_index
+from parsers.normalize import get_nlp
+from parsers.pdf_extractor import extract_pdf
+from parsers.pipeline import page_stages
+
+STAGES = (
+    "extract_pages",
+    "detect_boilerplate",
+    "detect_layout",
+    "build_blocks_and_roles",
+    "normalize_blocks",
+    "apply_profile",
+    "build_reading_order",
+    "build_sentence_index",
+)
+
+
+def _pipeline(path: Path, profile: str):
+    """
+    Yields (stage name, thunk); each thunk runs one stage on the previous
+    stages' output. Everything after extraction is parsers.pipeline.page_stages,
+    the same thunks /api/parse runs.
+    """
+    state = {}
+    yield "extract_pages", lambda: state.update(pages=extract_pdf(path))
+    yield from page_stages(state, profile)
+    yield "build_sentence_index", lambda: state.update(
+        index=build_sentence_index({"blocks": state["blocks"], "reading_order": state["order"]}))
+
+
+def _timed_run(path: Path, profile: str) -> dict:
+    stages = {}
+    for name, stage in _pipeline(path, profile):
+        w0, c0 = time.perf_counter(), time.process_time()
+        stage()
+        stages[name] = {"wall_s": time.perf_counter() - w0, "cpu_s": time.process_time() - c0}
+    return stages
+
+
+def _memory_run(path: Path, profile: str) -> dict:
+    peaks = {}
+    tracemalloc.start()
+    try:
+        for name, stage in _pipeline(path, profile):
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            stage()
+            peaks[name] = max(0, tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def run(page_counts, column_counts, densities, repeat: int, memory: bool, profile: str):
+    t0 = time.perf_counter()
+    get_nlp()
+    setup_s = time.perf_counter() - t0
+    print(f"setup (spaCy model load): {setup_s:.2f}s")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for columns in sorted(column_counts):
+            for density in sorted(densities):
+                for pages in sorted(page_counts):
+                    path = make_pdf(Path(tmp) / f"bench_{columns}c_{density}_{pages}.pdf", pages, columns, density)
+                    runs = [_timed_run(path, profile) for _ in range(repeat)]
+                    best = min(runs, key=lambda r: sum(s["wall_s"] for s in r.values()))
+                    peaks = _memory_run(path, profile) if memory else {}
+                    total_wall = sum(s["wall_s"] for s in best.values())
+                    stages = {
+                        name: {
+                            "wall_s": round(best[name]["wall_s"], 4),
+                            "cpu_s": round(best[name]["cpu_s"], 4),
+                            "share": round(best[name]["wall_s"] / total_wall, 3) if total_wall else None,
+                            "peak_mib": round(peaks[name] / 2**20, 2) if memory else None,
+                        }
+                        for name in STAGES
+                    }
+                    results.append({
+                        "columns": columns,
+                        "density": density,
+                        "pages": pages,
+                        "wall_s": round(total_wall, 4),
+                        "cpu_s": round(sum(s["cpu_s"] for s in best.values()), 4),
+                        "pages_per_s": round(pages / total_wall, 2) if total_wall else None,
+                        "peak_mib": round(max(peaks.values()) / 2**20, 2) if memory else None,
+                        "stages": stages,
+                    })
+                    r = results[-1]
+                    slowest = max(STAGES, key=lambda n: stages[n]["wall_s"])
+                    print(f"{columns}col {density:<6} {pages:>5} pages  {r['wall_s']:>8.3f}s  "
+                          f"{r['pages_per_s']:>8.2f} p/s  cpu {r['cpu_s']:.3f}s  "
+                          f"peak {r['peak_mib']} MiB  slowest {slowest} ({stages[slowest]['share']:.0%})")
+    return setup_s, results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=Path(__file__).resolve().parent,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parse pipeline stage by stage.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--columns", type=int, nargs="+", choices=(1, 2, 3), default=[1, 2, 3])
+    parser.add_argument("--density", nargs="+", choices=("dense", "sparse"), default=["dense", "sparse"])
+    parser.add_argument("--profile", default="academic")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass.")
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path.")
+    args = parser.parse_args()
+
+    setup_s, results = run(args.pages, args.columns, args.density, args.repeat, not args.no_memory, args.profile)
+    if args.json:
+        args.json.write_text(json.dumps({
+            "benchmark": "parse",
+            "commit": _git_commit(),
+            "cpu_count": os.cpu_count(),
+            "config": {"profile": args.profile, "repeat": args.repeat, "memory": not args.no_memory},
+            "stages": list(STAGES),
+            "setup_s": round(setup_s, 3),
+            "results": results,
+        }, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Sentence segmentation benchmark: blocks/s per SENTENCE_SEGMENTER mode.
+
+    python -m bench.bench_segmentation [--pages 50] [--n-process 1 2] [--json out.json]
+
+Run from tts-reader/backend. Blocks come from a synthetic PDF run through
+extraction and block building. "per_block_full" is the old behaviour (full
+pipeline, one nlp() call per block) for reference. Sentence counts are
+compared against the parser mode so the accuracy cost of each mode is visible.
+"""
+import argparse
+import copy
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from bench.synthetic_pdf import make_pdf
+from parsers import normalize
+from parsers.layout_heuristics import build_blocks_and_roles
+from parsers.normalize import get_nlp, normalize_blocks
+from parsers.pdf_extractor import extract_pdf
+
+MODES = ("parser", "senter", "sentencizer")
+
+
+def _sentences(blocks):
+    return [len(b["sentences"]) for b in blocks]
+
+
+def _per_block_full(nlp, blocks):
+    for block in blocks:
+        text = normalize._clean_text(block["text"])
+        block["text"] = text
+        block["sentences"] = [{"text": s.text.strip()} for s in nlp(text).sents]
+    return blocks
+
+
+def run(pages: int, n_process_values, batch_size: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_pdf(Path(tmp) / "seg.pdf", pages, columns=2)
+        source = build_blocks_and_roles(extract_pdf(path, 1))
+
+    # Honour --n-process even for a small benchmark document.
+    normalize.SEGMENT_MULTIPROCESS_MIN_BLOCKS = 0
+    runs = [("per_block_full", 1)] + [(m, n) for m in MODES for n in n_process_values]
+    results = []
+    reference = None
+    for mode, n_process in runs:
+        blocks = copy.deepcopy(source)
+        try:
+            if mode == "per_block_full":
+                full = normalize._load_model()
+                fn = lambda: _per_block_full(full, blocks)
+            else:
+                get_nlp(mode)  # load outside the timed region
+                fn = lambda: normalize_blocks(blocks, mode=mode, n_process=n_process, batch_size=batch_size)
+            t0 = time.perf_counter()
+            fn()
+            seconds = time.perf_counter() - t0
+        except (OSError, ValueError) as e:
+            print(f"{mode:<15} skipped: {e}")
+            continue
+
+        counts = _sentences(blocks)
+        if mode == "parser" and reference is None:
+            reference = counts
+        results.append({
+            "mode": mode,
+            "n_process": n_process,
+            "blocks": len(blocks),
+            "sentences": sum(counts),
+            "seconds": round(seconds, 4),
+            "blocks_per_s": round(len(blocks) / seconds, 1),
+            "_counts": counts,
+        })
+
+    for r in results:
+        counts = r.pop("_counts")
+        if reference is not None:
+            r["blocks_matching_parser"] = round(
+                sum(a == b for a, b in zip(counts, reference)) / max(len(reference), 1), 4)
+        match = r.get("blocks_matching_parser")
+        print(f"{r['mode']:<15} n_process={r['n_process']}  {r['blocks_per_s']:>9.1f} blocks/s  "
+              f"{r['sentences']:>6} sentences"
+              + (f"  {match:.1%} blocks match parser" if match is not None else ""))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sentence segmentation modes.")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--n-process", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path.")
+    args = parser.parse_args()
+
+    results = run(args.pages, args.n_process, args.batch_size)
+    if args.json:
+        args.json.write_text(json.dumps({"benchmark": "segmentation", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Stream send-loop microbenchmark: event-loop CPU per listener-second.
+
+    python -m bench.bench_stream_send [--listeners 20] [--seconds 10] [--packet-ms 20 100 200] [--json out.json]
+
+Run from tts-reader/backend. Each listener gets one cached sentence of PCM16
+at 48 kHz written to a local socket pair (a reader task drains the far end),
+so every send pays for a transport write and an await, as with a real
+WebSocket. "legacy" is the old loop: one `frame.tobytes()` copy and one send
+per 20 ms frame. The other rows use tts.codecs packets of `packet_ms`, sent as
+memoryviews. CPU is process time for the whole run divided by the audio
+seconds delivered.
+"""
+import argparse
+import asyncio
+import json
+import socket
+import time
+from pathlib import Path
+
+import numpy as np
+
+from tts.codecs import CODECS, FRAME_MS
+from tts.stream import SAMPLES_PER_FRAME
+
+
+class SocketSink:
+    """Minimal stand-in for a WebSocket: send_bytes writes to a local socket."""
+
+    async def open(self):
+        near, far = socket.socketpair()
+        _, self.writer = await asyncio.open_connection(sock=near)
+        reader, self._far_writer = await asyncio.open_connection(sock=far)
+        self._drain = asyncio.create_task(self._consume(reader))
+        self.sends = 0
+
+    async def _consume(self, reader):
+        while await reader.read(1 << 16):
+            pass
+
+    async def send_bytes(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+        self.sends += 1
+
+    async def close(self):
+        self.writer.close()
+        await self._drain
+        self._far_writer.close()
+
+
+async def _legacy(ws, audio):
+    for i in range(0, audio.size, SAMPLES_PER_FRAME):
+        await ws.send_bytes(audio[i:i + SAMPLES_PER_FRAME].tobytes())
+
+
+async def _packets(ws, audio, frames_per_packet):
+    for packet in CODECS["pcm16"].frames(audio, frames_per_packet):
+        await ws.send_bytes(packet)
+
+
+async def _run(listeners: int, audio: np.ndarray, send):
+    sinks = [SocketSink() for _ in range(listeners)]
+    for sink in sinks:
+        await sink.open()
+    t0, c0 = time.perf_counter(), time.process_time()
+    await asyncio.gather(*(send(sink, audio) for sink in sinks))
+    wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+    sends = sum(s.sends for s in sinks)
+    for sink in sinks:
+        await sink.close()
+    return wall, cpu, sends
+
+
+def run(listeners: int, seconds: float, packet_ms_values):
+    audio = (np.sin(np.arange(int(seconds * 48000)) / 8) * 8000).astype(np.int16)
+    listener_seconds = listeners * seconds
+    variants = [("legacy", 20, _legacy)] + [
+        (f"packets_{ms}ms", ms, lambda ws, a, n=max(1, ms // FRAME_MS): _packets(ws, a, n))
+        for ms in packet_ms_values
+    ]
+    results = []
+    for name, packet_ms, send in variants:
+        wall, cpu, sends = asyncio.run(_run(listeners, audio, send))
+        results.append({
+            "variant": name,
+            "packet_ms": packet_ms,
+            "listeners": listeners,
+            "sends": sends,
+            "cpu_ms_per_listener_s": round(cpu / listener_seconds * 1000, 4),
+            "wall_s": round(wall, 4),
+        })
+    base = results[0]["cpu_ms_per_listener_s"]
+    for r in results:
+        r["speedup_vs_legacy"] = round(base / r["cpu_ms_per_listener_s"], 2) if r["cpu_ms_per_listener_s"] else None
+        print(f"{r['variant']:<16} {r['sends']:>7} sends  {r['cpu_ms_per_listener_s']:>8.3f} ms CPU per listener-second  "
+              f"x{r['speedup_vs_legacy']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the stream send loop.")
+    parser.add_argument("--listeners", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=10.0, help="Audio seconds per listener.")
+    parser.add_argument("--packet-ms", type=int, nargs="+", default=[20, 100, 200])
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path.")
+    args = parser.parse_args()
+
+    results = run(args.listeners, args.seconds, args.packet_ms)
+    if args.json:
+        args.json.write_text(json.dumps({"benchmark": "stream_send", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
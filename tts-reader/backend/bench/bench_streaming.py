@@ -0,0 +1,333 @@
+"""
+End-to-end streaming benchmark: how many concurrent listeners one server process sustains.
+
+    python -m bench.bench_streaming [--clients 1 10 50] [--sentences 12] [--pages 3]
+                                    [--docs 1] [--stagger] [--flow auto|off] [--codec pcm16]
+                                    [--env KEY=VALUE ...] [--json out.json]
+
+Run from tts-reader/backend. For each client count a fresh server is started
+in a subprocess (uvicorn, TTS_PROVIDER=local, empty data and audio cache
+dirs), --docs synthetic PDFs are uploaded and parsed over HTTP, and N
+WebSocket clients stream --sentences sentences each from /api/stream, first
+with a cold audio cache, then again warm. Clients ack a simulated playhead
+(real-time playback from the first packet), as the web player does, so
+flow control behaves as in production.
+
+Per phase:
+  ttfa_ms          connect to first audio packet
+  sentence_gap_ms  end of a sentence's audio (its mark) to the next one's first packet;
+                   with --flow auto this includes flow-control waits, so
+                   underrun_ms is the listener-facing number
+  underrun_ms      playback stalls of the simulated player, per client
+  bytes_per_s      audio bytes received by all clients per wall second
+  loop_lag_ms      server event-loop lag (10 ms sleep overshoot)
+  cpu / rss        server process CPU time and resident memory
+plus the provider calls made by the server's TTS gateway. The local
+provider's latency, fault injection and the gateway limits are set with
+--env (e.g. --env LOCAL_TTS_LATENCY_MS=300 PROVIDER_RATE_PER_S=0). Clients
+run in this process, so on a small machine they compete with the server
+for CPU; compare results from the same machine.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from pathlib import Path
+
+import numpy as np
+import websockets
+
+from bench.synthetic_pdf import make_pdf
+from tts.codecs import CODECS
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+ACK_INTERVAL_S = 0.25
+
+
+# --- server side (python -m bench.bench_streaming --serve) ---
+
+def serve(port: int) -> None:
+    """Runs the app with a /bench/probe route for loop lag, CPU and memory."""
+    import resource
+    import uvicorn
+    from app import app
+    from api.routes_stream import tts_engine
+
+    lags = []
+    monitor = []
+
+    async def sample_loop_lag():
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append((time.perf_counter() - t0 - 0.01) * 1000)
+
+    @app.get("/bench/probe")
+    async def probe(reset: bool = False):
+        if not monitor:
+            monitor.append(asyncio.create_task(sample_loop_lag()))
+        loop_lag_ms = _percentiles(lags, (50, 99, 100))
+        if reset:
+            lags.clear()
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        return {
+            "cpu_s": time.process_time(),
+            "rss_bytes": rss,
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            "loop_lag_ms": loop_lag_ms,
+            "tts": tts_engine.stats(),
+        }
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+# --- client side ---
+
+def _percentiles(values, ps=(50, 95, 99, 100)) -> dict:
+    if len(values) == 0:
+        return {f"p{p}" if p < 100 else "max": None for p in ps}
+    pct = np.percentile(np.asarray(values, dtype=float), ps)
+    return {(f"p{p}" if p < 100 else "max"): round(float(v), 2) for p, v in zip(ps, pct)}
+
+
+def _http(base: str, path: str, body: bytes = None, headers: dict = None, timeout: float = 600) -> dict:
+    req = urllib.request.Request(base + path, data=body, headers=headers or {})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+
+def _upload_and_parse(base: str, pdf: Path) -> dict:
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{pdf.name}\"\r\n"
+        f"Content-Type: application/pdf\r\n\r\n"
+    ).encode() + pdf.read_bytes() + f"\r\n--{boundary}--\r\n".encode()
+    file_id = _http(base, "/api/upload", body, {"Content-Type": f"multipart/form-data; boundary={boundary}"})["file_id"]
+    doc = _http(base, "/api/parse", json.dumps({"file_id": file_id}).encode(), {"Content-Type": "application/json"})
+    return {"doc_id": file_id, "sentences": doc["sentence_index"]["count"]}
+
+
+class _Player:
+    """Simulated real-time playback starting at the first packet."""
+
+    def __init__(self):
+        self.started = None
+        self.received_ms = 0.0
+        self.buffered_until = None  # wall time the received audio runs out
+        self.underrun_ms = 0.0
+
+    def on_audio(self, now: float, ms: float) -> None:
+        if self.started is None:
+            self.started = self.buffered_until = now
+        elif now > self.buffered_until:
+            self.underrun_ms += (now - self.buffered_until) * 1000
+            self.buffered_until = now
+        self.buffered_until += ms / 1000
+        self.received_ms += ms
+
+    def played_ms(self, now: float) -> float:
+        if self.started is None:
+            return 0.0
+        return self.received_ms - max(0.0, self.buffered_until - now) * 1000
+
+
+async def _client(url: str, doc_id: str, start_sentence: int, sentences: int, flow: str, codec_name: str) -> dict:
+    player = _Player()
+    out = {"ttfa_ms": None, "gaps_ms": [], "bytes": 0, "marks": 0, "rate_limited": 0, "error": None}
+    t0 = time.perf_counter()
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            await ws.send(json.dumps({
+                "doc_id": doc_id, "start_sentence": start_sentence, "flow": flow, "codecs": [codec_name],
+            }))
+            codec = CODECS[codec_name]
+
+            async def ack():
+                while True:
+                    await asyncio.sleep(ACK_INTERVAL_S)
+                    await ws.send(json.dumps({"type": "ack", "played_ms": player.played_ms(time.perf_counter())}))
+
+            acker = asyncio.create_task(ack())
+            try:
+                last_mark = None
+                async for msg in ws:
+                    now = time.perf_counter()
+                    if isinstance(msg, bytes):
+                        if out["ttfa_ms"] is None:
+                            out["ttfa_ms"] = (now - t0) * 1000
+                        if last_mark is not None:
+                            out["gaps_ms"].append((now - last_mark) * 1000)
+                            last_mark = None
+                        out["bytes"] += len(msg)
+                        player.on_audio(now, codec.num_samples(np.frombuffer(msg, np.uint8)) * 1000 / codec.sample_rate)
+                        continue
+                    data = json.loads(msg)
+                    if data.get("type") == "hello":
+                        codec = CODECS[data["codec"]]
+                    elif data.get("type") == "mark":
+                        out["marks"] += 1
+                        out["rate_limited"] += data.get("status") == "rate_limited"
+                        last_mark = now
+                        if out["marks"] >= sentences:
+                            break
+            finally:
+                acker.cancel()
+    except Exception as e:
+        out["error"] = f"{type(e).__name__}: {e}"
+    out["wall_s"] = time.perf_counter() - t0
+    out["audio_ms"] = player.received_ms
+    out["underrun_ms"] = player.underrun_ms
+    return out
+
+
+async def _phase(base: str, docs, clients: int, sentences: int, stagger: bool, flow: str, codec: str, timeout: float):
+    url = base.replace("http://", "ws://") + "/api/stream"
+    jobs = []
+    for i in range(clients):
+        doc = docs[i % len(docs)]
+        start = (i // len(docs) * sentences) % max(doc["sentences"], 1) if stagger else 0
+        jobs.append(_client(url, doc["doc_id"], start, sentences, flow, codec))
+    t0 = time.perf_counter()
+    results = await asyncio.wait_for(asyncio.gather(*jobs), timeout)
+    return time.perf_counter() - t0, results
+
+
+def _summarize(clients: int, cache: str, wall: float, results, before: dict, after: dict) -> dict:
+    ttfa = [r["ttfa_ms"] for r in results if r["ttfa_ms"] is not None]
+    gaps = [g for r in results for g in r["gaps_ms"]]
+    audio_s = sum(r["audio_ms"] for r in results) / 1000
+    cpu_s = after["cpu_s"] - before["cpu_s"]
+    gw_before, gw_after = before["tts"]["gateway"], after["tts"]["gateway"]
+    return {
+        "clients": clients,
+        "cache": cache,
+        "wall_s": round(wall, 3),
+        "errors": sum(r["error"] is not None for r in results),
+        "sentences": sum(r["marks"] for r in results),
+        "rate_limited_marks": sum(r["rate_limited"] for r in results),
+        "ttfa_ms": _percentiles(ttfa),
+        "sentence_gap_ms": _percentiles(gaps),
+        "underrun_ms_per_client": _percentiles([r["underrun_ms"] for r in results]),
+        "bytes_per_s": round(sum(r["bytes"] for r in results) / wall, 1),
+        "audio_s": round(audio_s, 2),
+        "realtime_factor": round(audio_s / (wall * clients), 3),
+        "loop_lag_ms": after["loop_lag_ms"],
+        "server_cpu_util": round(cpu_s / wall, 3),
+        "server_cpu_ms_per_audio_s": round(cpu_s * 1000 / audio_s, 3) if audio_s else None,
+        "server_rss_mb": round(after["rss_bytes"] / 2**20, 1),
+        "server_peak_rss_mb": round(after["peak_rss_bytes"] / 2**20, 1),
+        "provider_calls": gw_after["calls"] - gw_before["calls"],
+        "provider_rate_limited": gw_after["rate_limited"] - gw_before["rate_limited"],
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(tmp: Path, env_overrides: dict):
+    port = _free_port()
+    env = {
+        **os.environ,
+        "TTS_PROVIDER": "local",
+        "DATA_DIR": str(tmp / "data"),
+        "AUDIO_CACHE_DIR": str(tmp / "audio"),
+        **env_overrides,
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "bench.bench_streaming", "--serve", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while True:
+        try:
+            _http(base, "/bench/probe", timeout=2)
+            return proc, base
+        except OSError:
+            if proc.poll() is not None or time.monotonic() > deadline:
+                proc.kill()
+                raise RuntimeError("Benchmark server failed to start")
+            time.sleep(0.2)
+
+
+def run(client_counts, sentences: int, pages: int, n_docs: int, stagger: bool, flow: str, codec: str,
+        env_overrides: dict, timeout: float):
+    results = []
+    for clients in client_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            proc, base = _start_server(tmp, env_overrides)
+            try:
+                docs = [_upload_and_parse(base, make_pdf(tmp / f"doc{d}.pdf", pages, seed=d)) for d in range(n_docs)]
+                for cache in ("cold", "warm"):
+                    before = _http(base, "/bench/probe?reset=true")
+                    wall, client_results = asyncio.run(_phase(base, docs, clients, sentences, stagger, flow, codec, timeout))
+                    after = _http(base, "/bench/probe")
+                    r = _summarize(clients, cache, wall, client_results, before, after)
+                    results.append(r)
+                    print(f"{clients:>4} clients {cache:<4}  ttfa p50 {r['ttfa_ms']['p50']} p95 {r['ttfa_ms']['p95']} ms  "
+                          f"gap p99 {r['sentence_gap_ms']['p99']} ms  underrun p95 {r['underrun_ms_per_client']['p95']} ms  "
+                          f"lag p99 {r['loop_lag_ms']['p99']} ms  cpu {r['server_cpu_util']:.0%}  "
+                          f"rss {r['server_rss_mb']} MB  calls {r['provider_calls']}  errors {r['errors']}")
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent end-to-end streaming.")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--sentences", type=int, default=12, help="Sentences each client listens to.")
+    parser.add_argument("--pages", type=int, default=3, help="Pages per fixture PDF.")
+    parser.add_argument("--docs", type=int, default=1, help="Distinct documents; clients are spread across them.")
+    parser.add_argument("--stagger", action="store_true", help="Start clients of a doc at different sentences.")
+    parser.add_argument("--flow", choices=("auto", "off"), default="auto")
+    parser.add_argument("--codec", choices=sorted(CODECS), default="pcm16")
+    parser.add_argument("--env", nargs="*", default=[], metavar="KEY=VALUE", help="Server environment overrides.")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Per-phase timeout in seconds.")
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path.")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port)
+        return
+
+    env_overrides = dict(kv.split("=", 1) for kv in args.env)
+    results = run(args.clients, args.sentences, args.pages, args.docs, args.stagger, args.flow, args.codec,
+                  env_overrides, args.timeout)
+    if args.json:
+        args.json.write_text(json.dumps({
+            "benchmark": "streaming",
+            "commit": _git_commit(),
+            "config": {
+                "sentences": args.sentences, "pages": args.pages, "docs": args.docs, "stagger": args.stagger,
+                "flow": args.flow, "codec": args.codec, "env": env_overrides,
+            },
+            "results": results,
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Regression harness: gap column detector vs. the GMM detector.
+
+For every page in the corpus both detectors run on the same blocks, and the
+per-block column assignments and per-page reading orders are compared.
+
+    python -m bench.compare_column_detectors [--pdf a.pdf b.pdf ...] [--min-agreement 0.98]
+
+Run from tts-reader/backend. The corpus is a set of synthetic PDFs
+(1-3 columns, dense and sparse) plus any --pdf files and the PDFs in
+eval/goldset/docs. Exits non-zero if block agreement is below --min-agreement.
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench.synthetic_pdf import make_pdf
+from parsers.layout_heuristics import _assign_to_columns, _detect_columns
+from parsers.pdf_extractor import extract_pdf
+
+GOLDSET_DOCS = Path(__file__).resolve().parent.parent / "eval" / "goldset" / "docs"
+
+
+def _page_order(blocks, cols):
+    return [b.index for b, _ in sorted(zip(blocks, cols), key=lambda t: (t[1], t[0].bbox[1], t[0].bbox[0]))]
+
+
+def compare(paths):
+    totals = {"pages": 0, "blocks": 0, "blocks_agree": 0, "pages_order_agree": 0,
+              "gap_s": 0.0, "gmm_s": 0.0}
+    per_doc = []
+    for path in paths:
+        doc = {"pdf": str(path), "pages": 0, "blocks": 0, "blocks_agree": 0, "pages_order_agree": 0}
+        for page in extract_pdf(path, 1):
+            text_blocks = [b for b in page.blocks if b.is_text]
+            bboxes = [b.bbox for b in text_blocks]
+
+            t0 = time.perf_counter()
+            gap_centers = _detect_columns(page.blocks, page.width, method="gap")
+            t1 = time.perf_counter()
+            gmm_centers = _detect_columns(page.blocks, page.width, method="gmm")
+            t2 = time.perf_counter()
+            totals["gap_s"] += t1 - t0
+            totals["gmm_s"] += t2 - t1
+
+            gap_cols = _assign_to_columns(bboxes, gap_centers)
+            gmm_cols = _assign_to_columns(bboxes, gmm_centers)
+            doc["pages"] += 1
+            doc["blocks"] += len(bboxes)
+            doc["blocks_agree"] += sum(a == b for a, b in zip(gap_cols, gmm_cols))
+            doc["pages_order_agree"] += _page_order(text_blocks, gap_cols) == _page_order(text_blocks, gmm_cols)
+        for k in ("pages", "blocks", "blocks_agree", "pages_order_agree"):
+            totals[k] += doc[k]
+        per_doc.append(doc)
+        print(f"{Path(path).name:<32} pages {doc['pages']:>4}  "
+              f"block agreement {doc['blocks_agree'] / max(doc['blocks'], 1):6.1%}  "
+              f"order agreement {doc['pages_order_agree'] / max(doc['pages'], 1):6.1%}")
+
+    pages = max(totals["pages"], 1)
+    summary = {
+        "pages": totals["pages"],
+        "blocks": totals["blocks"],
+        "block_agreement": totals["blocks_agree"] / max(totals["blocks"], 1),
+        "order_agreement": totals["pages_order_agree"] / pages,
+        "gap_us_per_page": totals["gap_s"] / pages * 1e6,
+        "gmm_us_per_page": totals["gmm_s"] / pages * 1e6,
+    }
+    return summary, per_doc
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare gap vs. GMM column detection.")
+    parser.add_argument("--pdf", type=Path, nargs="*", default=[])
+    parser.add_argument("--pages", type=int, default=20, help="Pages per synthetic PDF.")
+    parser.add_argument("--min-agreement", type=float, default=0.98)
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [
+            make_pdf(Path(tmp) / f"synthetic_{cols}col_{density}.pdf", args.pages, cols, density)
+            for cols in (1, 2, 3) for density in ("dense", "sparse")
+        ]
+        paths += args.pdf
+        if GOLDSET_DOCS.is_dir():
+            paths += sorted(GOLDSET_DOCS.glob("*.pdf"))
+        summary, per_doc = compare(paths)
+
+    print(f"\n{summary['pages']} pages, {summary['blocks']} blocks")
+    print(f"block agreement {summary['block_agreement']:.2%}, order agreement {summary['order_agreement']:.2%}")
+    print(f"gap {summary['gap_us_per_page']:.1f} us/page, gmm {summary['gmm_us_per_page']:.1f} us/page")
+    if args.json:
+        args.json.write_text(json.dumps({"benchmark": "column_detectors", "summary": summary,
+                                         "documents": per_doc}, indent=2))
+    if summary["block_agreement"] < args.min_agreement:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Deterministic synthetic PDFs for benchmarks.
+
+Pages carry a running head, a page number, and body paragraphs laid out
+in 1-3 columns. "dense" fills each column; "sparse" leaves most of it empty.
+
+    python -m bench.synthetic_pdf out.pdf --pages 100 --columns 2
+"""
+import argparse
+import random
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+_WORDS = (
+    "the of and to in is that for it as was with be by on not he this are or his from at which "
+    "but have an they you were her she there been one all we their has would when if so no will "
+    "layout column reader speech model page document section figure results method analysis data "
+    "system signal sample value process table report study paper network error rate time order"
+).split()
+
+PAGE_W, PAGE_H = 612, 792  # US Letter, points
+MARGIN = 54
+GUTTER = 18
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(8, 22))]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng: random.Random, sentences: int) -> str:
+    return " ".join(_sentence(rng) for _ in range(sentences))
+
+
+def make_pdf(path, pages: int, columns: int = 1, density: str = "dense", seed: int = 0) -> Path:
+    """Writes a synthetic PDF and returns its path."""
+    rng = random.Random(f"{seed}:{pages}:{columns}:{density}")
+    paragraphs_per_col = 6 if density == "dense" else 2
+    sentences_per_para = 4 if density == "dense" else 2
+    col_w = (PAGE_W - 2 * MARGIN - (columns - 1) * GUTTER) / columns
+    body_top, body_bottom = MARGIN + 40, PAGE_H - MARGIN - 30
+    para_h = (body_bottom - body_top) / paragraphs_per_col
+
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page(width=PAGE_W, height=PAGE_H)
+        page.insert_text((MARGIN, MARGIN), "Synthetic Proceedings on Layout-Aware Reading", fontsize=8)
+        for c in range(columns):
+            x0 = MARGIN + c * (col_w + GUTTER)
+            for k in range(paragraphs_per_col):
+                y0 = body_top + k * para_h
+                rect = fitz.Rect(x0, y0, x0 + col_w, y0 + para_h - 6)
+                page.insert_textbox(rect, _paragraph(rng, sentences_per_para), fontsize=8)
+        page.insert_text((PAGE_W / 2 - 6, PAGE_H - MARGIN / 2), str(p + 1), fontsize=8)
+
+    path = Path(path)
+    doc.save(str(path), garbage=3, deflate=True)
+    doc.close()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmark PDF.")
+    parser.add_argument("out", type=Path)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--columns", type=int, choices=(1, 2, 3), default=1)
+    parser.add_argument("--density", choices=("dense", "sparse"), default="dense")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    make_pdf(args.out, args.pages, args.columns, args.density, args.seed)
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import hashlib
+import json
 import os
 from pathlib import Path
 
@@ -10,14 +12,143 @@ TTS_MODEL_PATH = os.environ.get("TTS_MODEL_PATH", "tts_models/en/ljspeech/vits")
 # Path to the spaCy model
 SPACY_MODEL = os.environ.get("SPACY_MODEL", "en_core_web_sm")
 
+# Sentence segmentation: "parser" (dependency parse, most accurate),
+# "senter" (the model's statistical sentence recognizer, faster) or
+# "sentencizer" (rule-based punctuation splitting, fastest, no model needed)
+SENTENCE_SEGMENTER = os.environ.get("SENTENCE_SEGMENTER", "parser")
+SEGMENT_BATCH_SIZE = int(os.environ.get("SEGMENT_BATCH_SIZE", 64))
+# nlp.pipe worker processes; only used for documents with at least
+# SEGMENT_MULTIPROCESS_MIN_BLOCKS blocks, where it outweighs process startup
+SEGMENT_N_PROCESS = int(os.environ.get("SEGMENT_N_PROCESS", 1))
+SEGMENT_MULTIPROCESS_MIN_BLOCKS = int(os.environ.get("SEGMENT_MULTIPROCESS_MIN_BLOCKS", 2000))
+
 # Upload directory for files
 UPLOAD_DIR = BASE_DIR / "uploads"
 UPLOAD_DIR.mkdir(exist_ok=True)
+# One stored copy per distinct PDF content (by sha256); each upload's
+# <file_id>.pdf is a hard link to its blob
+UPLOAD_BLOB_DIR = UPLOAD_DIR / "blobs"
+UPLOAD_BLOB_DIR.mkdir(exist_ok=True)
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 200 * 1024 * 1024))
+UPLOAD_CHUNK_BYTES = int(os.environ.get("UPLOAD_CHUNK_BYTES", 1024 * 1024))
+
+# Persistent data (parsed documents, indexes)
+DATA_DIR = Path(os.environ.get("DATA_DIR", BASE_DIR / "data"))
+DATA_DIR.mkdir(exist_ok=True)
+
+# Parsed document store: hot in-memory LRU over a durable backend
+DOC_STORE_BACKEND = os.environ.get("DOC_STORE_BACKEND", "sqlite")  # "sqlite" | "memory"
+DOC_STORE_PATH = Path(os.environ.get("DOC_STORE_PATH", DATA_DIR / "documents.sqlite3"))
+DOC_CACHE_MAX_BYTES = int(os.environ.get("DOC_CACHE_MAX_BYTES", 64 * 1024 * 1024))  # serialized size
+
+# Content-addressed parse result cache (keyed by PDF sha256 + parser fingerprint)
+PARSE_CACHE_ENABLED = os.environ.get("PARSE_CACHE_ENABLED", "1") == "1"
+PARSE_CACHE_MAX_BYTES = int(os.environ.get("PARSE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+# Bump when parser code changes in a way that alters output.
+PARSE_PIPELINE_VERSION = 5
+
+# Background parse jobs (POST /api/parse/jobs)
+PARSE_JOB_WORKERS = int(os.environ.get("PARSE_JOB_WORKERS", 2))
+PARSE_JOB_TTL_S = float(os.environ.get("PARSE_JOB_TTL_S", 3600))
+# How often a stream waiting on a still-parsing doc checks for new pages
+STREAM_LIVE_POLL_MS = int(os.environ.get("STREAM_LIVE_POLL_MS", 100))
+
+# Streaming: upcoming sentences synthesized while the current one is sent.
+# Clients may request a depth via "prefetch" in their config, capped at the max.
+STREAM_PREFETCH_DEPTH = int(os.environ.get("STREAM_PREFETCH_DEPTH", 3))
+STREAM_PREFETCH_MAX = int(os.environ.get("STREAM_PREFETCH_MAX", 8))
+# Audio per WebSocket message, in whole 20 ms frames. Larger packets mean
+# fewer sends per listener-second; clients may ask for "packet_ms" up to the max.
+STREAM_PACKET_MS = int(os.environ.get("STREAM_PACKET_MS", 100))
+STREAM_PACKET_MAX_MS = int(os.environ.get("STREAM_PACKET_MAX_MS", 1000))
+# Flow control: audio in flight (sent, not yet played) per connection. Clients
+# ack their playhead; without acks sending is paced to real time. "off" sends
+# as fast as synthesis allows. Clients may ask for "window_ms" up to the max.
+STREAM_WINDOW_MS = int(os.environ.get("STREAM_WINDOW_MS", 3000))
+STREAM_WINDOW_MAX_MS = int(os.environ.get("STREAM_WINDOW_MAX_MS", 30000))
+STREAM_FLOW_MODE = os.environ.get("STREAM_FLOW_MODE", "auto")  # "auto" | "off"
+# Opus target bitrate, used when the client negotiates "opus" (needs opuslib)
+OPUS_BITRATE = int(os.environ.get("OPUS_BITRATE", 32000))
+
+# TTS provider: "gtts" (network) or "local" (deterministic synthetic speech,
+# no network; for load tests and reproducing rate limits offline)
+TTS_PROVIDER = os.environ.get("TTS_PROVIDER", "gtts")
+# Local provider: audio length per character, per-call latency (base + per
+# char, drawn from LOCAL_TTS_LATENCY_DIST: "fixed" | "uniform" | "exponential"
+# | "lognormal"), injected failure and 429 rates (0..1), a simulated
+# requests-per-second quota above which it returns 429s (0 = none), and the
+# RNG seed for latency and fault draws.
+LOCAL_TTS_MS_PER_CHAR = float(os.environ.get("LOCAL_TTS_MS_PER_CHAR", 65.0))
+LOCAL_TTS_LATENCY_MS = float(os.environ.get("LOCAL_TTS_LATENCY_MS", 150.0))
+LOCAL_TTS_LATENCY_PER_CHAR_MS = float(os.environ.get("LOCAL_TTS_LATENCY_PER_CHAR_MS", 1.0))
+LOCAL_TTS_LATENCY_DIST = os.environ.get("LOCAL_TTS_LATENCY_DIST", "lognormal")
+LOCAL_TTS_FAILURE_RATE = float(os.environ.get("LOCAL_TTS_FAILURE_RATE", 0.0))
+LOCAL_TTS_RATE_LIMIT_RATE = float(os.environ.get("LOCAL_TTS_RATE_LIMIT_RATE", 0.0))
+LOCAL_TTS_QUOTA_PER_S = float(os.environ.get("LOCAL_TTS_QUOTA_PER_S", 0.0))
+LOCAL_TTS_SEED = int(os.environ.get("LOCAL_TTS_SEED", 0))
+
+# TTS provider gateway (tts/gateway.py): concurrent provider calls (also the
+# size of its dedicated executor), token-bucket request rate (0 = unlimited),
+# and the shared cooldown after a 429, doubling per consecutive 429 up to the max.
+PROVIDER_MAX_CONCURRENCY = int(os.environ.get("PROVIDER_MAX_CONCURRENCY", 4))
+PROVIDER_RATE_PER_S = float(os.environ.get("PROVIDER_RATE_PER_S", 5.0))
+PROVIDER_BURST = float(os.environ.get("PROVIDER_BURST", 10))
+PROVIDER_COOLDOWN_S = float(os.environ.get("PROVIDER_COOLDOWN_S", 1.0))
+PROVIDER_COOLDOWN_MAX_S = float(os.environ.get("PROVIDER_COOLDOWN_MAX_S", 30.0))
+PROVIDER_MAX_RETRIES = int(os.environ.get("PROVIDER_MAX_RETRIES", 4))
+
+# Background pre-render: fill the audio cache for a whole doc after /api/parse
+PRERENDER_AFTER_PARSE = os.environ.get("PRERENDER_AFTER_PARSE", "0") == "1"
+PRERENDER_WORKERS = int(os.environ.get("PRERENDER_WORKERS", 1))
+# Provider slots kept free for live streams; pre-render waits while fewer are idle
+PRERENDER_RESERVE_SLOTS = int(os.environ.get("PRERENDER_RESERVE_SLOTS", 1))
+PRERENDER_POLL_MS = int(os.environ.get("PRERENDER_POLL_MS", 200))
+
+# Parse dependencies to load at startup instead of on the first parse,
+# comma-separated: "nlp" (spaCy pipeline), "pdf" (PyMuPDF), "ocr" (OCR worker
+# pool). Empty (default) keeps startup light, e.g. for stream-only workers.
+STARTUP_WARMUP = [c for c in os.environ.get("STARTUP_WARMUP", "").split(",") if c.strip()]
+
+# Page extraction: >1 splits the page range across a process pool
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", 1))
+# Below this many pages the pool's startup/IPC cost outweighs the speedup
+EXTRACT_PARALLEL_MIN_PAGES = int(os.environ.get("EXTRACT_PARALLEL_MIN_PAGES", 32))
+
+# OCR for scanned pages (needs paddleocr; without it they stay empty). A page
+# is scanned when it has at most OCR_SCANNED_MAX_CHARS of text and images
+# cover at least OCR_SCANNED_MIN_IMAGE_COVERAGE of it. Pages are OCRed in a
+# pool of OCR_WORKERS processes, each holding one long-lived engine.
+OCR_ENABLED = os.environ.get("OCR_ENABLED", "1") == "1"
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", 2))
+OCR_LANG = os.environ.get("OCR_LANG", "en")
+OCR_SCANNED_MAX_CHARS = int(os.environ.get("OCR_SCANNED_MAX_CHARS", 100))
+OCR_SCANNED_MIN_IMAGE_COVERAGE = float(os.environ.get("OCR_SCANNED_MIN_IMAGE_COVERAGE", 0.6))
+# Rasterize at the scan's own resolution, clamped to [MIN, MAX] DPI and to at
+# most OCR_MAX_PIXELS per page (bounds memory per worker)
+OCR_MIN_DPI = int(os.environ.get("OCR_MIN_DPI", 150))
+OCR_MAX_DPI = int(os.environ.get("OCR_MAX_DPI", 300))
+OCR_MAX_PIXELS = int(os.environ.get("OCR_MAX_PIXELS", 12_000_000))
+# Recognized lines below this confidence are dropped
+OCR_MIN_CONFIDENCE = float(os.environ.get("OCR_MIN_CONFIDENCE", 0.5))
+
+# Synthesized audio cache: in-memory LRU of hot PCM over a byte-bounded disk tier
+AUDIO_CACHE_DIR = os.environ.get("AUDIO_CACHE_DIR", str(BASE_DIR / "cache" / "audio"))
+AUDIO_CACHE_MEM_BYTES = int(os.environ.get("AUDIO_CACHE_MEM_BYTES", 128 * 1024 * 1024))
+AUDIO_CACHE_DISK_BYTES = int(os.environ.get("AUDIO_CACHE_DISK_BYTES", 4 * 1024 * 1024 * 1024))
+# Disk tier layout: "pack" (append-only segment files + index, memory-mapped
+# reads) or "files" (one .npy per sentence)
+AUDIO_CACHE_BACKEND = os.environ.get("AUDIO_CACHE_BACKEND", "pack")
+AUDIO_PACK_SEGMENT_BYTES = int(os.environ.get("AUDIO_PACK_SEGMENT_BYTES", 256 * 1024 * 1024))
 
 # Constants for layout parsing
+COLUMN_DETECTOR = os.environ.get("COLUMN_DETECTOR", "gap")  # "gap" | "gmm"
 COLUMN_MIN_SPACING_RATIO = 0.15  # of page width
+COLUMN_MIN_SUPPORT_RATIO = 0.0  # min share of a page's blocks per column (gap detector)
 HEADER_FOOTER_HEIGHT_RATIO = 0.15  # of page height
-HEADER_FOOTER_MIN_PAGES_RATIO = 0.6
+# Share of pages a header/footer must repeat on; running heads often
+# alternate between odd and even pages, so this stays under one half.
+HEADER_FOOTER_MIN_PAGES_RATIO = 0.4
+HEADER_FOOTER_MIN_PAGES = 2
 CAPTION_PROXIMITY_X_RATIO = 0.2  # of figure width
 CAPTION_PROXIMITY_Y_RATIO = 0.5  # of median line height
 
@@ -32,3 +163,34 @@ MIN_SYNTHESIS_RATE = 0.8
 MAX_SYNTHESIS_RATE = 2.0
 MIN_PLAYBACK_RATE = 0.8
 MAX_PLAYBACK_RATE = 2.5
+
+# Settings that change parse output. Anything listed here is folded into the
+# parse cache key, so editing one of them invalidates cached parses.
+_PARSER_SETTING_NAMES = [
+    "PARSE_PIPELINE_VERSION",
+    "SPACY_MODEL",
+    "SENTENCE_SEGMENTER",
+    "COLUMN_DETECTOR",
+    "COLUMN_MIN_SPACING_RATIO",
+    "COLUMN_MIN_SUPPORT_RATIO",
+    "HEADER_FOOTER_HEIGHT_RATIO",
+    "HEADER_FOOTER_MIN_PAGES_RATIO",
+    "HEADER_FOOTER_MIN_PAGES",
+    "CAPTION_PROXIMITY_X_RATIO",
+    "CAPTION_PROXIMITY_Y_RATIO",
+    "OCR_ENABLED",
+    "OCR_LANG",
+    "OCR_SCANNED_MAX_CHARS",
+    "OCR_SCANNED_MIN_IMAGE_COVERAGE",
+    "OCR_MIN_DPI",
+    "OCR_MAX_DPI",
+    "OCR_MAX_PIXELS",
+    "OCR_MIN_CONFIDENCE",
+]
+
+
+def parser_fingerprint() -> str:
+    """Short, stable hash of the parser settings above."""
+    settings = {name: globals()[name] for name in _PARSER_SETTING_NAMES}
+    payload = json.dumps(settings, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
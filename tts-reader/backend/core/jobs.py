@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from core.config import PARSE_JOB_WORKERS, PARSE_JOB_TTL_S
+from core.metrics import REGISTRY
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ParseJob:
+    """
+    A background parse. `doc` is a live document whose `blocks` and
+    `reading_order` lists only ever grow, one page at a time, so readers
+    (e.g. the stream loop) can consume it while parsing continues.
+    """
+
+    def __init__(self, doc_id: str):
+        self.job_id = str(uuid.uuid4())
+        self.doc_id = doc_id
+        self.status = "queued"  # queued | running | done | error
+        self.error: Optional[str] = None
+        self.total_pages = 0
+        self.pages_done = 0
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.doc = {"doc_id": doc_id, "blocks": [], "reading_order": []}
+        # (block offset, reading-order offset) at the start of each published page
+        self._page_offsets = []
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error")
+
+    def publish_page(self, blocks: list, order: list) -> None:
+        self._page_offsets.append((len(self.doc["blocks"]), len(self.doc["reading_order"])))
+        # Blocks before order entries: a reader that sees an id can always resolve it.
+        self.doc["blocks"].extend(blocks)
+        self.doc["reading_order"].extend(order)
+        self.pages_done += 1
+
+    def partial(self, from_page: int = 0) -> dict:
+        """Blocks and reading order for published pages >= from_page."""
+        pages_done = self.pages_done
+        blocks = self.doc["blocks"]
+        order = self.doc["reading_order"]
+        if from_page >= pages_done:
+            block_slice, order_slice = [], []
+        else:
+            b0, o0 = self._page_offsets[max(from_page, 0)]
+            b1, o1 = (
+                self._page_offsets[pages_done] if pages_done < len(self._page_offsets)
+                else (len(blocks), len(order))
+            )
+            block_slice, order_slice = blocks[b0:b1], order[o0:o1]
+        return {
+            **self.summary(),
+            "from_page": from_page,
+            "next_page": pages_done,
+            "blocks": block_slice,
+            "reading_order": order_slice,
+        }
+
+    def summary(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "doc_id": self.doc_id,
+            "status": self.status,
+            "error": self.error,
+            "pages_done": self.pages_done,
+            "total_pages": self.total_pages,
+            "progress": (self.pages_done / self.total_pages) if self.total_pages else (1.0 if self.status == "done" else 0.0),
+        }
+
+
+class JobRegistry:
+    """
+    Runs parse jobs on a small dedicated thread pool and keeps them around
+    for PARSE_JOB_TTL_S after they finish so clients can poll the result.
+    """
+
+    def __init__(self, max_workers: int, ttl_s: float):
+        self.ttl_s = ttl_s
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="parse-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, doc_id: str, run: Callable[[ParseJob], None]) -> ParseJob:
+        job = ParseJob(doc_id)
+        with self._lock:
+            self._prune()
+            self._jobs[job.job_id] = job
+        self._executor.submit(self._run, job, run)
+        return job
+
+    def get(self, job_id: str) -> Optional[ParseJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_for_doc(self, doc_id: str) -> Optional[ParseJob]:
+        """Most recent unfinished job producing this doc, if any."""
+        with self._lock:
+            jobs = [j for j in self._jobs.values() if j.doc_id == doc_id and not j.finished]
+        return max(jobs, key=lambda j: j.created_at) if jobs else None
+
+    def counts(self) -> dict:
+        """Jobs per status, including finished ones not yet pruned."""
+        counts = dict.fromkeys(("queued", "running", "done", "error"), 0)
+        with self._lock:
+            for j in self._jobs.values():
+                counts[j.status] += 1
+        return counts
+
+    def _run(self, job: ParseJob, run: Callable[[ParseJob], None]) -> None:
+        job.status = "running"
+        try:
+            run(job)
+            job.status = "done"
+        except Exception as e:
+            logger.exception(f"Parse job {job.job_id} failed")
+            job.error = str(e)
+            job.status = "error"
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.ttl_s
+        stale = [jid for jid, j in self._jobs.items() if j.finished_at and j.finished_at < cutoff]
+        for jid in stale:
+            del self._jobs[jid]
+
+
+PARSE_JOBS = JobRegistry(PARSE_JOB_WORKERS, PARSE_JOB_TTL_S)
+
+def _collect_metrics():
+    counts = PARSE_JOBS.counts()
+    yield ("tts_reader_parse_jobs", "gauge", "Background parse jobs queued or running.",
+           [({"status": s}, counts[s]) for s in ("queued", "running")])
+
+REGISTRY.register_collector(_collect_metrics)
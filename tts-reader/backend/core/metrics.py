@@ -0,0 +1,186 @@
+"""
+In-process metrics in the Prometheus text format, served at /api/metrics.
+
+Counters, gauges and histograms here are updated on hot paths, so each one
+is a dict of label values -> numbers behind its own lock: an update is a
+dict lookup and an add. State that components already count themselves
+(audio cache, provider gateway, job registries) is not duplicated; they
+register a collector that reads their stats() at scrape time instead.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Tuple
+
+# Seconds; covers cache-hot paths (~1 ms) up to slow provider calls and parses.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self) -> Iterable[Tuple[str, dict, float]]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][i] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                yield f"{self.name}_bucket", {**labels, "le": _fmt(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels=()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels=()) -> Gauge:
+        return self._add(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def register_collector(self, collect: Callable[[], Iterable[tuple]]) -> None:
+        """
+        `collect()` is called per scrape and yields (name, kind, help, samples),
+        where samples is a list of (labels dict, value).
+        """
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics, collectors = list(self._metrics), list(self._collectors)
+        lines = []
+        for m in metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(_line(name, labels, value) for name, labels, value in m.samples())
+        for collect in collectors:
+            for name, kind, help, samples in collect():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(_line(name, labels, value) for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _line(name: str, labels: dict, value: float) -> str:
+    if labels:
+        escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for v in labels.values())
+        label_str = ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped))
+        return f"{name}{{{label_str}}} {_fmt(value)}"
+    return f"{name} {_fmt(value)}"
+
+
+REGISTRY = Registry()
+
+# Parse
+PARSE_STAGE_SECONDS = REGISTRY.histogram(
+    "tts_reader_parse_stage_seconds", "Parse pipeline stage latency.", ("stage",))
+PARSE_REQUESTS = REGISTRY.counter(
+    "tts_reader_parse_requests_total", "Parse requests by outcome.", ("outcome",))
+
+# Synthesis
+PROVIDER_SECONDS = REGISTRY.histogram(
+    "tts_reader_provider_seconds", "TTS provider call latency, per attempt.", ("outcome",))
+SYNTH_SECONDS = REGISTRY.histogram(
+    "tts_reader_synth_seconds", "Synthesis latency seen by callers (cache misses, including queueing).")
+
+# Streaming
+STREAM_CONNECTIONS = REGISTRY.gauge(
+    "tts_reader_stream_connections", "Open /api/stream connections.")
+STREAM_TTFA_SECONDS = REGISTRY.histogram(
+    "tts_reader_stream_time_to_first_audio_seconds", "Stream start to first audio packet sent.")
+STREAM_PACKETS = REGISTRY.counter(
+    "tts_reader_stream_packets_total", "Audio packets sent.", ("codec",))
+STREAM_BYTES = REGISTRY.counter(
+    "tts_reader_stream_bytes_total", "Audio bytes sent.", ("codec",))
+STREAM_SENTENCES = REGISTRY.counter(
+    "tts_reader_stream_sentences_total", "Sentences streamed, by mark status.", ("status",))
@@ -0,0 +1,133 @@
+"""
+Flattened sentence index, built once per parse and stored with the document
+as doc["sentence_index"]. One entry per readable sentence, in reading order,
+kept as parallel lists so it stays small in JSON:
+
+  block_pos     position of the sentence's block in doc["blocks"]
+  sent_pos      position of the sentence within that block
+  durations_ms  audio duration when known (cached audio), else None
+  ends_ms       cumulative end time of each sentence, unknown durations
+                estimated from the doc's speech rate
+  estimated     how many durations_ms are estimates (None)
+  block_start   per reading_order position: first sentence at or after it
+  block_first   block id -> its first sentence number
+
+Sentence numbers are global, so the stream can start at any sentence, any
+block, or a time offset without rebuilding per-block lookups per connection.
+"""
+import bisect
+from itertools import accumulate
+from typing import Callable, Optional
+
+# Speech rate used for sentences whose audio is not cached yet (~15 chars/s).
+DEFAULT_MS_PER_CHAR = 65.0
+
+
+def build_sentence_index(doc: dict, duration_of: Optional[Callable[[str], Optional[float]]] = None) -> dict:
+    """`duration_of(text)` returns the cached audio length in ms, or None."""
+    blocks = doc.get("blocks", [])
+    pos_by_id = {b["id"]: i for i, b in enumerate(blocks)}
+    block_pos, sent_pos, durations, chars = [], [], [], []
+    block_start, block_first = [], {}
+    for block_id in doc.get("reading_order", []):
+        block_start.append(len(block_pos))
+        bp = pos_by_id.get(block_id)
+        if bp is None or blocks[bp].get("policy") != "read":
+            continue
+        sentences = blocks[bp].get("sentences", [])
+        if sentences:
+            block_first[block_id] = len(block_pos)
+        for sp, s in enumerate(sentences):
+            block_pos.append(bp)
+            sent_pos.append(sp)
+            durations.append(duration_of(s["text"]) if duration_of else None)
+            chars.append(len(s["text"]))
+    return {
+        "count": len(block_pos),
+        "block_pos": block_pos,
+        "sent_pos": sent_pos,
+        "durations_ms": durations,
+        "ends_ms": _end_offsets(durations, chars),
+        "estimated": durations.count(None),
+        "block_start": block_start,
+        "block_first": block_first,
+    }
+
+
+def _end_offsets(durations: list, chars: list) -> list:
+    known_ms = known_chars = 0
+    for d, c in zip(durations, chars):
+        if d is not None:
+            known_ms += d
+            known_chars += c
+    ms_per_char = known_ms / known_chars if known_chars else DEFAULT_MS_PER_CHAR
+    return list(accumulate(d if d is not None else c * ms_per_char for d, c in zip(durations, chars)))
+
+
+def ensure_sentence_index(doc: dict) -> dict:
+    """
+    The stored index, or for docs parsed before it (or its time offsets)
+    existed a fresh one. The doc (usually shared, from DOC_STORE) is not
+    modified.
+    """
+    index = doc.get("sentence_index")
+    return index if index is not None and "ends_ms" in index else build_sentence_index(doc)
+
+
+def refresh_durations(doc: dict, index: dict, duration_of: Callable[[str], Optional[float]]) -> Optional[dict]:
+    """
+    A copy of `index` with the durations cached since it was built filled in
+    and the time offsets recomputed, or None if nothing new is cached. O(n):
+    run it off the event loop.
+    """
+    if not index["estimated"]:
+        return None
+    durations = list(index["durations_ms"])
+    chars = []
+    found = 0
+    for n in range(index["count"]):
+        text = doc["blocks"][index["block_pos"][n]]["sentences"][index["sent_pos"][n]]["text"]
+        chars.append(len(text))
+        if durations[n] is None:
+            durations[n] = duration_of(text)
+            found += durations[n] is not None
+    if not found:
+        return None
+    return {**index, "durations_ms": durations, "ends_ms": _end_offsets(durations, chars),
+            "estimated": index["estimated"] - found}
+
+
+def sentence_at(doc: dict, index: dict, n: int) -> dict:
+    block = doc["blocks"][index["block_pos"][n]]
+    sp = index["sent_pos"][n]
+    return {"id": f"{block['id']}_s{sp}", "text": block["sentences"][sp]["text"], "index": n}
+
+
+def locate(index: dict, config: dict):
+    """
+    Resolves a start position from stream config to (sentence number, ms
+    into that sentence). Precedence: "start_sentence" (global number),
+    "start_sentence_id" ("<block id>_s<n>"), "start_ms" (time offset into
+    the document), then "start_index" (reading-order block position).
+    Sentence and block seeks are O(1); time seeks bisect the index's end
+    offsets, O(log n).
+    """
+    count = index["count"]
+    if config.get("start_sentence") is not None:
+        return min(max(int(config["start_sentence"]), 0), count), 0.0
+    if config.get("start_sentence_id"):
+        block_id, _, sp = str(config["start_sentence_id"]).rpartition("_s")
+        first = index["block_first"].get(block_id)
+        if first is not None and sp.isdigit():
+            return min(first + int(sp), count), 0.0
+    if config.get("start_ms") is not None:
+        target = max(float(config["start_ms"]), 0.0)
+        ends = index["ends_ms"]
+        n = bisect.bisect_right(ends, target)
+        if n >= count:
+            return count, 0.0
+        return n, target - (ends[n - 1] if n else 0.0)
+    start_block = int(config.get("start_index", 0))
+    if start_block >= len(index["block_start"]):
+        return count, 0.0
+    return index["block_start"][max(start_block, 0)], 0.0
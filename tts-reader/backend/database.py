@@ -1,3 +1,254 @@
-# In-memory storage for document data.
-# In a real application, you would use a database or a more persistent cache.
-DOC_DATA = {}
+import json
+import logging
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from core.config import (
+    DOC_STORE_BACKEND,
+    DOC_STORE_PATH,
+    DOC_CACHE_MAX_BYTES,
+    PARSE_CACHE_MAX_BYTES,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _encode(doc: dict) -> bytes:
+    return json.dumps(doc, separators=(",", ":")).encode("utf-8")
+
+
+def _decode(raw: bytes) -> dict:
+    return json.loads(raw.decode("utf-8"))
+
+
+class MemoryBackend:
+    """
+    Cold tier kept in process memory (compressed). Not durable; useful for dev.
+    """
+
+    def __init__(self):
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            blob = self._rows.get(key)
+        return zlib.decompress(blob) if blob is not None else None
+
+    def put(self, key: str, raw: bytes) -> None:
+        blob = zlib.compress(raw, 1)
+        with self._lock:
+            self._rows[key] = blob
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._rows.pop(key, None)
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            return key in self._rows
+
+
+class SQLiteBackend:
+    """
+    Durable cold tier: one row per document, zlib-compressed JSON.
+    A single connection is shared across threads behind a lock; WAL mode lets
+    several worker processes read the same file concurrently.
+    """
+
+    def __init__(self, path: Path, table: str = "documents"):
+        self.path = Path(path)
+        self.table = table
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30.0)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                " key TEXT PRIMARY KEY,"
+                " data BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " updated_at REAL NOT NULL DEFAULT (julianday('now')))"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT data FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        return zlib.decompress(row[0]) if row else None
+
+    def put(self, key: str, raw: bytes) -> None:
+        blob = zlib.compress(raw, 1)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, data, size) VALUES (?, ?, ?)",
+                (key, blob, len(raw)),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT 1 FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        return row is not None
+
+
+class DocumentStore:
+    """
+    Two-tier store for parsed documents:
+      - Hot tier: in-process LRU of decoded docs, bounded by serialized byte size.
+      - Cold tier: a pluggable backend holding every doc.
+    Docs are written through to the cold tier and loaded lazily on first access.
+    get() hands out the hot tier's own dict, shared by every caller: treat it
+    as read-only and keep per-caller state (e.g. audio durations) elsewhere.
+    """
+
+    def __init__(self, backend, max_hot_bytes: int = DOC_CACHE_MAX_BYTES):
+        self.backend = backend
+        self.max_hot_bytes = max_hot_bytes
+        self._hot = OrderedDict()  # key -> (doc, size)
+        self._hot_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._hot.get(key)
+            if entry is not None:
+                self._hot.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        raw = self.backend.get(key)
+        if raw is None:
+            return None
+        doc = _decode(raw)
+        self._admit(key, doc, len(raw))
+        return doc
+
+    def put(self, key: str, doc: dict) -> None:
+        raw = _encode(doc)
+        self.backend.put(key, raw)
+        self._admit(key, doc, len(raw))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            entry = self._hot.pop(key, None)
+            if entry is not None:
+                self._hot_bytes -= entry[1]
+        self.backend.delete(key)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            if key in self._hot:
+                return True
+        return self.backend.contains(key)
+
+    def __getitem__(self, key: str) -> dict:
+        doc = self.get(key)
+        if doc is None:
+            raise KeyError(key)
+        return doc
+
+    def __setitem__(self, key: str, doc: dict) -> None:
+        self.put(key, doc)
+
+    def _admit(self, key: str, doc: dict, size: int) -> None:
+        with self._lock:
+            old = self._hot.pop(key, None)
+            if old is not None:
+                self._hot_bytes -= old[1]
+            if size > self.max_hot_bytes:
+                # Too large for the hot tier; serve it from the cold tier only.
+                return
+            self._hot[key] = (doc, size)
+            self._hot_bytes += size
+            while self._hot_bytes > self.max_hot_bytes and self._hot:
+                _, (_, evicted_size) = self._hot.popitem(last=False)
+                self._hot_bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hot_docs": len(self._hot),
+                "hot_bytes": self._hot_bytes,
+                "max_hot_bytes": self.max_hot_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class UploadRegistry:
+    """
+    Maps uploaded file_ids to the sha256 of their content.
+    Uses the document store's SQLite file, or a private in-memory DB for the
+    "memory" backend.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=30.0)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS uploads ("
+                " file_id TEXT PRIMARY KEY,"
+                " sha256 TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL DEFAULT (julianday('now')))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS uploads_sha256 ON uploads (sha256)")
+            self._conn.commit()
+
+    def record(self, file_id: str, sha256: str, size: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads (file_id, sha256, size) VALUES (?, ?, ?)",
+                (file_id, sha256, size),
+            )
+            self._conn.commit()
+
+    def sha256_for(self, file_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256 FROM uploads WHERE file_id = ?", (file_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+
+def _make_backend(kind: str, table: str):
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "sqlite":
+        return SQLiteBackend(DOC_STORE_PATH, table=table)
+    raise ValueError(f"Unknown DOC_STORE_BACKEND: {kind}")
+
+
+# Parsed documents keyed by doc_id.
+DOC_STORE = DocumentStore(_make_backend(DOC_STORE_BACKEND, "documents"))
+
+# Parse results keyed by content hash + parser fingerprint + profile options.
+PARSE_CACHE = DocumentStore(
+    _make_backend(DOC_STORE_BACKEND, "parse_cache"), max_hot_bytes=PARSE_CACHE_MAX_BYTES
+)
+
+UPLOADS = UploadRegistry(DOC_STORE_PATH if DOC_STORE_BACKEND == "sqlite" else ":memory:")
@@ -0,0 +1,121 @@
+"""
+Document-wide detection of running heads, running feet and page numbers.
+
+A text block is boilerplate when it sits in the top or bottom band of its
+page (HEADER_FOOTER_HEIGHT_RATIO) and the same fingerprint appears on enough
+distinct pages (HEADER_FOOTER_MIN_PAGES_RATIO of the document, and at least
+HEADER_FOOTER_MIN_PAGES). A fingerprint is a 64-bit hash of the band and the
+block text with case, punctuation and whitespace folded and numbers masked,
+so "Page 3 of 12" and "Page 4 of 12" match. All fingerprints of a document
+go into one array and are grouped with np.unique in a single pass.
+"""
+import hashlib
+import logging
+import math
+import re
+
+import numpy as np
+
+from core.config import (
+    HEADER_FOOTER_HEIGHT_RATIO,
+    HEADER_FOOTER_MIN_PAGES,
+    HEADER_FOOTER_MIN_PAGES_RATIO,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HEADER_BAND = 1
+FOOTER_BAND = 2
+
+_NUMBER = re.compile(r"\d+")
+# Front-matter page numbers: well-formed numerals below 100 only, so words
+# made of numeral letters ("civil", "mix", "dim", "mild") are left alone.
+_ROMAN = re.compile(r"(page )?(?=[ivxlc]+$)(xc|xl|l?x{0,3})(ix|iv|v?i{0,3})")
+_NON_WORD = re.compile(r"[^\w#]+")
+_PAGENUM = re.compile(r"(page )?#( (of )?#)?")
+
+
+def band(bbox, page_height: float) -> int:
+    """HEADER_BAND, FOOTER_BAND, or 0 for the body of the page."""
+    if bbox[3] < HEADER_FOOTER_HEIGHT_RATIO * page_height:
+        return HEADER_BAND
+    if bbox[1] > (1 - HEADER_FOOTER_HEIGHT_RATIO) * page_height:
+        return FOOTER_BAND
+    return 0
+
+
+def fold_text(text: str) -> str:
+    """Lowercased words with numbers (and roman page numbers) masked as "#"."""
+    folded = _NON_WORD.sub(" ", _NUMBER.sub("#", text.lower())).strip()
+    roman = _ROMAN.fullmatch(folded)
+    return f"{roman.group(1) or ''}#" if roman else folded
+
+
+def _fingerprint(band_: int, folded: str) -> int:
+    digest = hashlib.blake2b(f"{band_}|{folded}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def _candidates(page):
+    """(block, band, folded text, fingerprint) for the page's non-empty text blocks in a band."""
+    for block in page.blocks:
+        if not block.is_text:
+            continue
+        band_ = band(block.bbox, page.height)
+        if not band_:
+            continue
+        folded = fold_text(block.text)
+        if folded:
+            yield block, band_, folded, _fingerprint(band_, folded)
+
+
+class BoilerplateIndex:
+    """
+    Fingerprints that repeat across a document. Built once from all pages,
+    then applied page by page with roles(), so a parse that publishes pages
+    incrementally can build it from a cheap pre-scan of the text layer
+    (pdf_extractor.extract_outline_pages).
+    """
+
+    def __init__(self, pages):
+        keys, page_nums = [], []
+        n_pages = 0
+        for page in pages:
+            n_pages += 1
+            for *_, key in _candidates(page):
+                keys.append(key)
+                page_nums.append(page.page_num)
+
+        self.n_pages = n_pages
+        self.min_pages = max(HEADER_FOOTER_MIN_PAGES, math.ceil(HEADER_FOOTER_MIN_PAGES_RATIO * n_pages))
+        self._repeated = np.empty(0, dtype=np.int64)
+        if keys:
+            # One row per (fingerprint, page), then count pages per fingerprint.
+            pairs = np.unique(np.column_stack((np.asarray(keys, dtype=np.int64),
+                                               np.asarray(page_nums, dtype=np.int64))), axis=0)
+            fingerprints, n_pages_seen = np.unique(pairs[:, 0], return_counts=True)
+            self._repeated = fingerprints[n_pages_seen >= self.min_pages]
+        logger.info(f"Boilerplate: {self._repeated.size} repeated header/footer fingerprints over {n_pages} pages.")
+
+    def __len__(self) -> int:
+        return int(self._repeated.size)
+
+    def roles(self, page) -> dict:
+        """block.index -> "header", "footer" or "pagenum" for the page's boilerplate blocks."""
+        if not self._repeated.size:
+            return {}
+        candidates = list(_candidates(page))
+        if not candidates:
+            return {}
+        hits = np.isin(np.fromiter((c[3] for c in candidates), dtype=np.int64, count=len(candidates)),
+                       self._repeated)
+        roles = {}
+        for (block, band_, folded, _), hit in zip(candidates, hits):
+            if not hit:
+                continue
+            if _PAGENUM.fullmatch(folded):
+                roles[block.index] = "pagenum"
+            else:
+                roles[block.index] = "header" if band_ == HEADER_BAND else "footer"
+        return roles
@@ -1,89 +1,122 @@
 import logging
 import numpy as np
-from sklearn.mixture import GaussianMixture
 from core.config import (
+    COLUMN_DETECTOR,
     COLUMN_MIN_SPACING_RATIO,
-    HEADER_FOOTER_HEIGHT_RATIO,
-    HEADER_FOOTER_MIN_PAGES_RATIO,
+    COLUMN_MIN_SUPPORT_RATIO,
 )
+from parsers.boilerplate import BoilerplateIndex
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def _get_text_from_rawdict_block(block: dict) -> str:
-    """Extracts and reconstructs text from a rawdict block from PyMuPDF."""
-    if "lines" not in block:
-        return ""
-    
-    line_texts = []
-    for line in block["lines"]:
-        span_texts = []
-        for span in line["spans"]:
-            span_texts.append("".join(c["c"] for c in span["chars"]))
-        line_texts.append("".join(span_texts))
-    return "\n".join(line_texts)
-
-
-def build_blocks_and_roles(pages, layout_model_output=None):
+def build_blocks_and_roles(pages, layout_model_output=None, boilerplate: BoilerplateIndex = None):
     """
     Builds text blocks from low-level page data and assigns roles using heuristics.
+    Running heads, feet and page numbers found by `boilerplate` (default: an
+    index over `pages`) get their role and policy "skip".
     """
     if layout_model_output:
         # If a layout model is used, this function would integrate its output.
         logger.info("Integrating layout model output (not implemented)")
         pass
 
+    if boilerplate is None:
+        boilerplate = BoilerplateIndex(pages)
+
     all_blocks = []
     for page_data in pages:
-        page_width = page_data["width"]
-        page_height = page_data["height"]
+        page_width = page_data.width
         
         # Simple block building: treat each block from PyMuPDF as a preliminary block
-        prelim_blocks = page_data.get("blocks", [])
+        prelim_blocks = page_data.blocks
         
         # Column detection
         columns = _detect_columns(prelim_blocks, page_width)
         
-        # Header and footer detection (needs to be done across pages, so this is a simplification)
-        # A more robust implementation would analyze blocks from all pages at once.
+        # Header and footer detection (document-wide, see parsers.boilerplate)
+        roles = boilerplate.roles(page_data)
+
+        text_blocks = [b for b in prelim_blocks if b.is_text]
+        col_indices = _assign_to_columns([b.bbox for b in text_blocks], columns)
         
-        for i, block in enumerate(prelim_blocks):
-            if "lines" not in block: continue
-            
-            bbox = block["bbox"]
-            col_idx = _assign_to_column(bbox, columns)
+        for block, col_idx in zip(text_blocks, col_indices):
+            bbox = block.bbox
             
             # Role assignment (very basic heuristics for now)
-            role = "body"
-            if _is_header_or_footer(bbox, page_height):
-                role = "footer" # Simplified
-            
+            role = roles.get(block.index, "body")
+
             all_blocks.append({
-                "id": f"p{page_data['page_num']}_b{i}",
-                "page": page_data["page_num"],
+                "id": f"p{page_data.page_num}_b{block.index}",
+                "page": page_data.page_num,
                 "bbox": bbox,
                 "column": col_idx,
                 "role": role,
-                "text": _get_text_from_rawdict_block(block),
-                "confidence": 1.0, # Heuristic-based
-                "policy": "read" # Default policy
+                "text": block.text,
+                "confidence": block.confidence, # 1.0 for the text layer, OCR line confidence otherwise
+                "source": page_data.source,
+                "policy": "read" if role == "body" else "skip" # boilerplate is never normalized or read
             })
             
     logger.info(f"Built {len(all_blocks)} blocks using heuristics.")
     return all_blocks
 
-def _detect_columns(blocks, page_width):
+def _detect_columns(blocks, page_width, method=None):
     """
-    Detects columns on a page using a Gaussian Mixture Model on block centroids.
+    Detects 1-3 column centers on a page from block centroids.
+    `method` (default COLUMN_DETECTOR) is "gap" for the fast 1-D gap detector
+    or "gmm" for Gaussian Mixture Models with BIC selection.
     """
     if not blocks:
         return []
         
-    centroids = np.array([(b["bbox"][0] + b["bbox"][2]) / 2 for b in blocks if "bbox" in b]).reshape(-1, 1)
+    centroids = np.array([(b.bbox[0] + b.bbox[2]) / 2 for b in blocks]).reshape(-1, 1)
     if len(centroids) < 3: # Not enough blocks to determine columns
         return [page_width / 2] if len(centroids) > 0 else []
 
+    if (method or COLUMN_DETECTOR) == "gmm":
+        return _detect_columns_gmm(centroids, page_width)
+    return _detect_columns_gap(centroids.ravel(), page_width)
+
+def _detect_columns_gap(centroids, page_width):
+    """
+    Splits sorted centroids at the (at most two) widest gaps that exceed the
+    minimum column spacing. Like the GMM path, a well-separated outlier (a
+    running head, a page number) becomes its own group; raising
+    COLUMN_MIN_SUPPORT_RATIO drops such small groups instead. Runs in
+    microseconds and needs no model fitting.
+    """
+    x = np.sort(centroids)
+    gaps = np.diff(x)
+    min_gap = COLUMN_MIN_SPACING_RATIO * page_width
+    candidates = np.flatnonzero(gaps > min_gap)
+    if candidates.size == 0:
+        return [float(x.mean())]
+
+    splits = np.sort(candidates[np.argsort(gaps[candidates])[::-1][:2]])
+    bounds = np.concatenate(([0], splits + 1, [x.size]))
+    sizes = np.diff(bounds)
+    sums = np.add.reduceat(x, bounds[:-1])
+    min_support = max(1, int(np.ceil(COLUMN_MIN_SUPPORT_RATIO * x.size)))
+    keep = sizes >= min_support
+    if keep.sum() <= 1:
+        return [float(x.mean())]
+
+    centers = (sums[keep] / sizes[keep]).tolist()
+    # Filter out columns that are too close
+    final_centers = [centers[0]]
+    for center in centers[1:]:
+        if center - final_centers[-1] > min_gap:
+            final_centers.append(center)
+    return final_centers
+
+def _detect_columns_gmm(centroids, page_width):
+    """
+    Detects columns using a Gaussian Mixture Model on block centroids.
+    """
+    from sklearn.mixture import GaussianMixture
+
     # Use BIC to find the best number of columns (k=1, 2, 3)
     bics = []
     for k in range(1, 4):
@@ -102,23 +135,17 @@ def _detect_columns(blocks, page_width):
                 final_centers.append(center)
         return final_centers
     
-    return [np.mean(centroids)] if len(centroids) > 0 else []
-
-def _assign_to_column(bbox, column_centers):
-    if not column_centers:
-        return 0
-    block_center_x = (bbox[0] + bbox[2]) / 2
-    # Find the closest column center and convert to a standard Python int
-    return int(np.argmin([abs(block_center_x - center) for center in column_centers]))
+    return [float(np.mean(centroids))]
 
-def _is_header_or_footer(bbox, page_height):
-    """
-    Checks if a block is likely a header or footer based on its vertical position.
-    """
-    y0, y1 = bbox[1], bbox[3]
-    is_header = y1 < HEADER_FOOTER_HEIGHT_RATIO * page_height
-    is_footer = y0 > (1 - HEADER_FOOTER_HEIGHT_RATIO) * page_height
-    return is_header or is_footer
+def _assign_to_columns(bboxes, column_centers):
+    """Index of the closest column center for each bbox (first center wins ties)."""
+    if not column_centers or not bboxes:
+        return [0] * len(bboxes)
+    b = np.asarray(bboxes, dtype=float)
+    block_center_x = (b[:, 0] + b[:, 2]) / 2
+    distances = np.abs(block_center_x[:, None] - np.asarray(column_centers)[None, :])
+    # Convert to standard Python ints for JSON
+    return distances.argmin(axis=1).tolist()
 
 def build_reading_order(blocks):
     """
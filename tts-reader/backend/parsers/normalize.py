@@ -1,38 +1,111 @@
 import logging
 import re
-import spacy
-from core.config import SPACY_MODEL
+import threading
+from core.config import (
+    SPACY_MODEL,
+    SENTENCE_SEGMENTER,
+    SEGMENT_BATCH_SIZE,
+    SEGMENT_N_PROCESS,
+    SEGMENT_MULTIPROCESS_MIN_BLOCKS,
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-try:
-    nlp = spacy.load(SPACY_MODEL)
-except OSError:
-    logger.warning(f"SpaCy model '{SPACY_MODEL}' not found. Downloading...")
-    spacy.cli.download(SPACY_MODEL)
-    nlp = spacy.load(SPACY_MODEL)
+# Components each mode needs; everything else (tagger, NER, lemmatizer, ...)
+# is disabled since only sentence boundaries are used.
+_MODE_COMPONENTS = {
+    "parser": {"tok2vec", "parser"},
+    "senter": {"senter"},
+}
+_SENTENCE_SETTERS = ("parser", "senter", "sentencizer")
+_pipelines = {}
+_load_lock = threading.Lock()
 
-def normalize_blocks(blocks):
+def _load_model():
+    import spacy
+    try:
+        return spacy.load(SPACY_MODEL)
+    except OSError as e:
+        # Never download at runtime: install models at build time
+        # (scripts/download_models.sh) or point SPACY_MODEL at a local path.
+        raise RuntimeError(
+            f"spaCy model '{SPACY_MODEL}' is not installed; run `python -m spacy download {SPACY_MODEL}`"
+        ) from e
+
+def get_nlp(mode: str = None):
+    """
+    Returns the segmentation pipeline for `mode` (default SENTENCE_SEGMENTER),
+    loading it on first use (or at startup, see parsers.pipeline.warmup).
+    """
+    mode = mode or SENTENCE_SEGMENTER
+    nlp = _pipelines.get(mode)
+    if nlp is not None:
+        return nlp
+
+    with _load_lock:  # concurrent first requests load the model once
+        nlp = _pipelines.get(mode)
+        if nlp is not None:
+            return nlp
+        import spacy
+        if mode == "sentencizer":
+            nlp = spacy.blank("en")
+            nlp.add_pipe("sentencizer")
+        elif mode in _MODE_COMPONENTS:
+            nlp = _load_model()
+            wanted = _MODE_COMPONENTS[mode] | {"sentencizer"}
+            if mode == "senter" and "senter" in nlp.disabled:
+                # Packaged models ship senter disabled; select_pipes never re-enables it.
+                nlp.enable_pipe("senter")
+            if mode == "senter" and "senter" not in nlp.pipe_names:
+                logger.warning(f"'{SPACY_MODEL}' has no senter component; using the parser.")
+                wanted = _MODE_COMPONENTS["parser"] | {"sentencizer"}
+            nlp.select_pipes(enable=[name for name in nlp.component_names if name in wanted])
+            if not any(name in nlp.pipe_names for name in _SENTENCE_SETTERS):
+                nlp.add_pipe("sentencizer")
+        else:
+            raise ValueError(f"Unknown SENTENCE_SEGMENTER: {mode}")
+
+        logger.info(f"Sentence segmentation mode '{mode}': {nlp.pipe_names}")
+        _pipelines[mode] = nlp
+        return nlp
+
+def normalize_blocks(blocks, mode: str = None, n_process: int = None, batch_size: int = None):
     """
     Normalizes text in each block and performs sentence segmentation.
+    Blocks are segmented in batches through nlp.pipe; large documents can
+    fan out over `n_process` processes (default SEGMENT_N_PROCESS).
+    Blocks already marked policy "skip" (boilerplate) are cleaned but not
+    segmented, and get no sentences.
     """
+    targets = []
     for block in blocks:
-        if "text" in block:
-            # Basic text cleaning
-            text = _clean_text(block["text"])
-            
-            # Sentence segmentation
-            doc = nlp(text)
-            sentences = []
-            for sent in doc.sents:
-                sentences.append({
-                    "text": sent.text.strip(),
-                    "start_char": sent.start_char,
-                    "end_char": sent.end_char,
-                })
-            block["text"] = text
-            block["sentences"] = sentences
+        if "text" not in block:
+            continue
+        if block.get("policy") == "skip":
+            block["text"] = _clean_text(block["text"])
+            block["sentences"] = []
+        else:
+            targets.append(block)
+    # Basic text cleaning
+    texts = [_clean_text(block["text"]) for block in targets]
+
+    n_process = SEGMENT_N_PROCESS if n_process is None else n_process
+    if len(texts) < SEGMENT_MULTIPROCESS_MIN_BLOCKS:
+        n_process = 1
+    docs = get_nlp(mode).pipe(texts, batch_size=batch_size or SEGMENT_BATCH_SIZE, n_process=n_process)
+
+    # Sentence segmentation
+    for block, text, doc in zip(targets, texts, docs):
+        sentences = []
+        for sent in doc.sents:
+            sentences.append({
+                "text": sent.text.strip(),
+                "start_char": sent.start_char,
+                "end_char": sent.end_char,
+            })
+        block["text"] = text
+        block["sentences"] = sentences
             
     logger.info("Normalized and segmented sentences for all blocks.")
     return blocks
@@ -1,52 +1,308 @@
+"""
+OCR for scanned pages. Scanned pages are detected on the extracted Page
+(little text, mostly image) and re-extracted here: rasterized at an
+adaptive DPI, recognized with PaddleOCR, and returned as a Page whose text
+blocks are grouped OCR lines, so they go through the normal block pipeline.
+
+Engines are expensive to build, so each lives as long as its process: one
+per worker of a small process pool (OCR_WORKERS), or one in this process
+when OCR_WORKERS <= 1. Workers open the PDF and rasterize pages themselves,
+so page images never cross process boundaries, and at most two pages per
+worker are in flight at once, which bounds memory.
+"""
+import importlib.util
 import logging
-from PIL import Image
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-# Conditional import for PaddleOCR
-try:
-    from paddleocr import PaddleOCR
-except ImportError:
-    PaddleOCR = None
+
+import numpy as np
+
+from core.config import (
+    OCR_LANG,
+    OCR_MAX_DPI,
+    OCR_MAX_PIXELS,
+    OCR_MIN_CONFIDENCE,
+    OCR_MIN_DPI,
+    OCR_SCANNED_MAX_CHARS,
+    OCR_SCANNED_MIN_IMAGE_COVERAGE,
+    OCR_WORKERS,
+)
+from core.metrics import PARSE_STAGE_SECONDS
+from parsers.page_model import TEXT_BLOCK, Block, Line, Page
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def ocr_page(image: Image.Image):
+# Used when a scanned page's image resolution is unknown.
+_FALLBACK_DPI = 220
+
+_engine = None  # this process's PaddleOCR instance
+_engine_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+_warned_unavailable = False
+
+
+def ocr_available() -> bool:
+    return importlib.util.find_spec("paddleocr") is not None
+
+
+def is_scanned(page: Page) -> bool:
+    """Little or no text layer, mostly covered by images."""
+    return (page.text_chars <= OCR_SCANNED_MAX_CHARS
+            and page.image_coverage() >= OCR_SCANNED_MIN_IMAGE_COVERAGE)
+
+
+def _get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            from paddleocr import PaddleOCR
+            # Slow (loads, and on first run downloads, the models): once per process.
+            _engine = PaddleOCR(use_angle_cls=True, lang=OCR_LANG)
+        return _engine
+
+
+def _init_worker():
+    try:
+        _get_engine()
+    except Exception as e:
+        # Leave the worker up; its pages come back without OCR text.
+        logger.error(f"Failed to start OCR engine: {e}")
+
+
+def ocr_page(image: np.ndarray):
     """
-    Performs OCR on a single page image using PaddleOCR.
+    Performs OCR on a single page image (H x W x 3 uint8, RGB) using PaddleOCR.
+    Returns line spans with bboxes in image pixels.
     """
-    if PaddleOCR is None:
-        logger.warning("PaddleOCR is not installed. OCR functionality is disabled.")
+    try:
+        engine = _get_engine()
+    except Exception as e:
+        logger.error(f"OCR engine unavailable: {e}")
         return []
 
-    # Initialize PaddleOCR. Note: This can be slow on first run.
-    # It's better to initialize it once in the application's lifecycle.
-    ocr_engine = PaddleOCR(use_angle_cls=True, lang='en')
-    
-    # The result will be a list of [bbox, (text, confidence)]
-    result = ocr_engine.ocr(image, cls=True)
-    
+    # The result will be a list of [quad, (text, confidence)] per page
+    result = engine.ocr(image, cls=True)
+
     spans = []
-    if result:
-        for line in result[0]:
-            box, (text, conf) = line
-            # Convert bbox to [x0, y0, x1, y1]
-            x0, y0 = box[0]
-            x1, y1 = box[2]
+    if result and result[0]:
+        for quad, (text, conf) in result[0]:
+            if conf < OCR_MIN_CONFIDENCE or not text.strip():
+                continue
+            xs = [p[0] for p in quad]
+            ys = [p[1] for p in quad]
             spans.append({
                 "text": text,
-                "bbox": [x0, y0, x1, y1],
-                "confidence": conf,
+                "bbox": [min(xs), min(ys), max(xs), max(ys)],
+                "confidence": float(conf),
                 "source": "ocr"
             })
-            
-    logger.info(f"OCR processed page and found {len(spans)} text spans.")
     return spans
 
-def rasterize_page_for_ocr(doc, page_num: int, dpi: int = 220):
+
+def choose_dpi(page) -> int:
+    """
+    Rasterization DPI for a PyMuPDF page: the resolution of its largest
+    image (upsampling past the scan adds no detail), clamped to
+    [OCR_MIN_DPI, OCR_MAX_DPI] and to at most OCR_MAX_PIXELS pixels.
+    """
+    dpi = None
+    infos = [i for i in page.get_image_info() if i["bbox"][2] > i["bbox"][0]]
+    if infos:
+        largest = max(infos, key=lambda i: (i["bbox"][2] - i["bbox"][0]) * (i["bbox"][3] - i["bbox"][1]))
+        dpi = largest["width"] * 72 / (largest["bbox"][2] - largest["bbox"][0])
+    dpi = min(max(dpi or _FALLBACK_DPI, OCR_MIN_DPI), OCR_MAX_DPI)
+    page_sq_in = (page.rect.width / 72) * (page.rect.height / 72)
+    if page_sq_in > 0:
+        dpi = min(dpi, (OCR_MAX_PIXELS / page_sq_in) ** 0.5)
+    return max(int(dpi), 1)
+
+
+def rasterize_page_for_ocr(doc, page_num: int, dpi: int = None):
     """
-    Rasterizes a PDF page to an image for OCR.
+    Rasterizes a PDF page for OCR. Returns (pixmap, RGB array view of it);
+    keep the pixmap alive while the array is in use.
     """
     page = doc.load_page(page_num)
-    pix = page.get_pixmap(dpi=dpi)
-    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-    return img
+    pix = page.get_pixmap(dpi=dpi or choose_dpi(page), alpha=False)
+    image = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    return pix, image
+
+
+def spans_to_page(spans, page_num: int, width: float, height: float, rotation: int, scale: float) -> Page:
+    """
+    Groups OCR lines into text blocks: a line joins the block above it when
+    they overlap horizontally and the vertical gap is under a line height.
+    `scale` converts image pixels to PDF points.
+    """
+    groups = []  # [bbox list, lines, confidences]
+    for s in sorted(spans, key=lambda s: (s["bbox"][1], s["bbox"][0])):
+        x0, y0, x1, y1 = (v * scale for v in s["bbox"])
+        line_h = max(y1 - y0, 1e-6)
+        for g in reversed(groups):
+            gx0, _, gx1, _ = g[0]
+            last_bottom = g[1][-1].bbox[3]
+            overlap = min(x1, gx1) - max(x0, gx0)
+            if overlap > 0.5 * min(x1 - x0, gx1 - gx0) and -0.5 * line_h <= y0 - last_bottom <= 0.8 * line_h:
+                g[0] = [min(gx0, x0), g[0][1], max(gx1, x1), max(g[0][3], y1)]
+                g[1].append(Line((x0, y0, x1, y1), s["text"]))
+                g[2].append(s["confidence"])
+                break
+        else:
+            groups.append([[x0, y0, x1, y1], [Line((x0, y0, x1, y1), s["text"])], [s["confidence"]]])
+    blocks = [
+        Block(i, TEXT_BLOCK, tuple(bbox), tuple(lines), sum(confs) / len(confs))
+        for i, (bbox, lines, confs) in enumerate(groups)
+    ]
+    return Page(page_num, width, height, rotation, blocks, source="ocr")
+
+
+def _ocr_page_file(path: str, page_num: int) -> Page:
+    """Worker entry point: rasterize and recognize one page of the PDF at `path`."""
+    import fitz  # PyMuPDF
+    with fitz.open(path) as doc:
+        page = doc.load_page(page_num)
+        pix, image = rasterize_page_for_ocr(doc, page_num)
+        spans = ocr_page(image)
+        scale = page.rect.width / pix.width
+        return spans_to_page(spans, page_num, page.rect.width, page.rect.height, page.rotation, scale)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that already runs server threads is unsafe
+            _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker)
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _ping() -> bool:
+    return _engine is not None
+
+
+def warmup() -> None:
+    """Starts the OCR workers (or this process's engine) so the first scan doesn't pay for it."""
+    if not ocr_available():
+        logger.warning("PaddleOCR is not installed; scanned pages will not be OCRed.")
+        return
+    if OCR_WORKERS <= 1:
+        _get_engine()
+        return
+    pool = _get_pool()
+    ready = [f.result() for f in [pool.submit(_ping) for _ in range(OCR_WORKERS)]]
+    logger.info(f"OCR workers ready: {sum(ready)}/{len(ready)} pinged")
+
+
+def ocr_pages(path: Path, page_nums):
+    """
+    OCRs the given pages of the PDF at `path`, yielding (page_num, Page or
+    None on failure) in the order given. Pages run in parallel on the pool
+    with at most 2 * OCR_WORKERS in flight.
+    """
+    global _warned_unavailable
+    if not ocr_available():
+        if not _warned_unavailable:
+            logger.warning("PaddleOCR is not installed. OCR functionality is disabled.")
+            _warned_unavailable = True
+        for n in page_nums:
+            yield n, None
+        return
+
+    if OCR_WORKERS <= 1:
+        for n in page_nums:
+            try:
+                yield n, _ocr_page_file(str(path), n)
+            except Exception as e:
+                logger.error(f"OCR failed on page {n}: {e}")
+                yield n, None
+        return
+
+    in_flight = deque()
+    pending = iter(page_nums)
+    while True:
+        while len(in_flight) < 2 * OCR_WORKERS:
+            n = next(pending, None)
+            if n is None:
+                break
+            in_flight.append((n, _submit(str(path), n)))
+        if not in_flight:
+            return
+        n, fut = in_flight.popleft()
+        try:
+            yield n, fut.result()
+        except Exception as e:
+            logger.error(f"OCR failed on page {n}: {e}")
+            yield n, None
+
+
+def ocr_scanned_pages(path: Path, pages):
+    """
+    Yields the extracted Pages from `pages` in order, with scanned pages
+    replaced by their OCR result (kept as extracted if OCR fails). Reads up
+    to 2 * OCR_WORKERS pages ahead, so scanned pages of a document consumed
+    page by page are still recognized in parallel on the pool.
+    """
+    if OCR_WORKERS <= 1 or not ocr_available():
+        for page in pages:
+            if is_scanned(page):
+                _, recognized = next(ocr_pages(path, [page.page_num]))
+                page = recognized or page
+            yield page
+        return
+
+    window = deque()  # (extracted page, OCR future or None), in page order
+    try:
+        for page in pages:
+            window.append((page, _submit(str(path), page.page_num) if is_scanned(page) else None))
+            while window and (len(window) >= 2 * OCR_WORKERS or window[0][1] is None or window[0][1].done()):
+                yield _resolve(*window.popleft())
+        while window:
+            yield _resolve(*window.popleft())
+    finally:
+        for _, fut in window:  # consumer stopped early
+            if fut is not None:
+                fut.cancel()
+
+
+def _resolve(page: Page, fut) -> Page:
+    if fut is None:
+        return page
+    try:
+        with PARSE_STAGE_SECONDS.time(stage="ocr"):  # time spent waiting on the pool
+            return fut.result()
+    except Exception as e:
+        logger.error(f"OCR failed on page {page.page_num}: {e}")
+        return page
+
+
+def _submit(path: str, page_num: int):
+    pool = _get_pool()
+    try:
+        fut = pool.submit(_ocr_page_file, path, page_num)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM) since the last submit: start a fresh pool once.
+        _discard_pool(pool)
+        pool = _get_pool()
+        fut = pool.submit(_ocr_page_file, path, page_num)
+    fut.add_done_callback(lambda f: _on_done(pool, f))
+    return fut
+
+
+def _on_done(pool: ProcessPoolExecutor, fut) -> None:
+    if not fut.cancelled() and isinstance(fut.exception(), BrokenProcessPool):
+        _discard_pool(pool)  # the next submit starts a fresh pool
@@ -0,0 +1,98 @@
+"""
+Compact intermediate representation for extracted pages.
+
+PyMuPDF's "rawdict" output holds a dict (with its own bbox) per character,
+which dominates parse memory and time. Pages here keep one slotted object per
+block and per line, with text as plain strings. Per-character detail is
+materialized only on request (see pdf_extractor.extract_page_chars).
+"""
+
+TEXT_BLOCK = 0
+IMAGE_BLOCK = 1
+
+
+class Line:
+    __slots__ = ("bbox", "text")
+
+    def __init__(self, bbox: tuple, text: str):
+        self.bbox = bbox
+        self.text = text
+
+    # Positional pickling keeps process-pool payloads small.
+    def __reduce__(self):
+        return (Line, (self.bbox, self.text))
+
+
+class Block:
+    """
+    A PyMuPDF block (or a group of OCR lines). `index` is its position in the
+    page's block list; `confidence` is the mean OCR confidence, 1.0 for text.
+    """
+
+    __slots__ = ("index", "kind", "bbox", "lines", "confidence")
+
+    def __init__(self, index: int, kind: int, bbox: tuple, lines: tuple = (), confidence: float = 1.0):
+        self.index = index
+        self.kind = kind
+        self.bbox = bbox
+        self.lines = lines
+        self.confidence = confidence
+
+    @property
+    def is_text(self) -> bool:
+        return self.kind == TEXT_BLOCK
+
+    @property
+    def text(self) -> str:
+        return "\n".join(line.text for line in self.lines)
+
+    def __reduce__(self):
+        return (Block, (self.index, self.kind, self.bbox, self.lines, self.confidence))
+
+
+class Page:
+    """`source` is "text" (PDF text layer) or "ocr" (recognized from a scan)."""
+
+    __slots__ = ("page_num", "width", "height", "rotation", "blocks", "source")
+
+    def __init__(self, page_num: int, width: float, height: float, rotation: int, blocks: list, source: str = "text"):
+        self.page_num = page_num
+        self.width = width
+        self.height = height
+        self.rotation = rotation
+        self.blocks = blocks
+        self.source = source
+
+    @property
+    def text_chars(self) -> int:
+        return sum(len(line.text.strip()) for b in self.blocks if b.is_text for line in b.lines)
+
+    def image_coverage(self) -> float:
+        """Share of the page area under image blocks (overlaps counted twice, capped at 1)."""
+        area = self.width * self.height
+        if area <= 0:
+            return 0.0
+        covered = sum(
+            max(0.0, min(b.bbox[2], self.width) - max(b.bbox[0], 0.0))
+            * max(0.0, min(b.bbox[3], self.height) - max(b.bbox[1], 0.0))
+            for b in self.blocks if not b.is_text
+        )
+        return min(covered / area, 1.0)
+
+    def __reduce__(self):
+        return (Page, (self.page_num, self.width, self.height, self.rotation, self.blocks, self.source))
+
+
+def page_from_dict(page_dict: dict, page_num: int, rotation: int) -> Page:
+    """Builds a Page from PyMuPDF's get_text("dict") output (spans, no per-char data)."""
+    blocks = []
+    for i, b in enumerate(page_dict["blocks"]):
+        if b.get("type", TEXT_BLOCK) != TEXT_BLOCK:
+            blocks.append(Block(i, IMAGE_BLOCK, tuple(b["bbox"])))
+            continue
+        lines = tuple(
+            Line(tuple(line["bbox"]), "".join(span["text"] for span in line["spans"]))
+            for line in b.get("lines", ())
+        )
+        blocks.append(Block(i, TEXT_BLOCK, tuple(b["bbox"]), lines))
+    return Page(page_num, page_dict["width"], page_dict["height"], rotation, blocks)
@@ -0,0 +1,90 @@
+import logging
+from parsers.pdf_extractor import extract_outline_pages, extract_pages, iter_pages
+from parsers.layout_model import detect_layout
+from parsers.layout_heuristics import build_blocks_and_roles, build_reading_order
+from parsers.boilerplate import BoilerplateIndex
+from parsers.normalize import get_nlp, normalize_blocks
+from parsers.profiles import apply_profile
+from parsers import ocr
+from core.config import COLUMN_DETECTOR
+from core.metrics import PARSE_STAGE_SECONDS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def run_pipeline(file_id: str, profile: str = "academic", include_captions: bool = False):
+    """
+    Runs the full parse pipeline over every page.
+    Returns (blocks, reading_order), or None if the PDF is missing or empty.
+    """
+    with PARSE_STAGE_SECONDS.time(stage="extract_pages"):
+        pages = extract_pages(file_id)
+    if not pages:
+        return None
+    return _process_pages(pages, profile, include_captions)
+
+def iter_page_results(file_id: str, profile: str = "academic", include_captions: bool = False):
+    """
+    Runs the pipeline one page at a time and yields (page_num, blocks, reading_order)
+    as each page finishes. Header/footer detection needs the whole document, so
+    it runs first on a text-only pre-scan; every other stage works page-locally,
+    so concatenating the per-page results gives the same output as run_pipeline
+    (except that headers on OCRed pages are not recognized here).
+    """
+    with PARSE_STAGE_SECONDS.time(stage="detect_boilerplate"):
+        boilerplate = BoilerplateIndex(extract_outline_pages(file_id))
+    for page in iter_pages(file_id):
+        blocks, order = _process_pages([page], profile, include_captions, boilerplate)
+        yield page.page_num, blocks, order
+
+def warmup(components):
+    """
+    Loads parse dependencies ahead of the first request: "nlp" (the spaCy
+    segmentation pipeline, and sklearn when COLUMN_DETECTOR is "gmm"), "pdf"
+    (PyMuPDF) and "ocr" (the OCR worker pool and its engines). Without it
+    everything loads lazily on first use.
+    """
+    for component in (c.strip() for c in components):
+        with PARSE_STAGE_SECONDS.time(stage=f"warmup_{component}"):
+            if component == "nlp":
+                get_nlp()
+                if COLUMN_DETECTOR == "gmm":
+                    import sklearn.mixture  # noqa: F401
+            elif component == "pdf":
+                import fitz  # noqa: F401
+            elif component == "ocr":
+                ocr.warmup()
+            else:
+                raise ValueError(f"Unknown STARTUP_WARMUP component: {component}")
+        logger.info(f"Warmed up {component}")
+
+def page_stages(state: dict, profile: str = "academic", include_captions: bool = False, boilerplate=None):
+    """
+    The stages after extraction, in order, as (stage name, thunk) pairs. Each
+    thunk runs one stage on `state` (which must hold "pages" by the time the
+    first one runs) and stores its output there, ending with state["blocks"]
+    and state["order"]. With `boilerplate` given (an index built up front),
+    there is no detect_boilerplate stage. _process_pages runs these under
+    PARSE_STAGE_SECONDS; bench.bench_parse times the same thunks.
+    """
+    if boilerplate is None:
+        yield "detect_boilerplate", lambda: state.update(boilerplate=BoilerplateIndex(state["pages"]))
+    else:
+        state["boilerplate"] = boilerplate
+    yield "detect_layout", lambda: state.update(layout=detect_layout(state["pages"]))
+    yield "build_blocks_and_roles", lambda: state.update(
+        blocks=build_blocks_and_roles(state["pages"], state["layout"], state["boilerplate"]))
+    yield "normalize_blocks", lambda: state.update(blocks=normalize_blocks(state["blocks"]))
+    yield "apply_profile", lambda: state.update(blocks=apply_profile(
+        state["blocks"],
+        profile=profile,
+        include_captions=include_captions
+    ))
+    yield "build_reading_order", lambda: state.update(order=build_reading_order(state["blocks"]))
+
+def _process_pages(pages, profile, include_captions, boilerplate=None):
+    state = {"pages": pages}
+    for name, run in page_stages(state, profile, include_captions, boilerplate):
+        with PARSE_STAGE_SECONDS.time(stage=name):
+            run()
+    return state["blocks"], state["order"]
@@ -0,0 +1,21 @@
+"""
+Startup budget (scripts/check_startup_budget.py) as a test: `import app`
+must stay within the import-time and idle-RSS budgets and must not load
+any of the lazily imported parse/TTS dependencies.
+"""
+import importlib.util
+from pathlib import Path
+
+_SCRIPT = Path(__file__).resolve().parents[2] / "scripts" / "check_startup_budget.py"
+_spec = importlib.util.spec_from_file_location("check_startup_budget", _SCRIPT)
+budget = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(budget)
+
+
+def test_import_stays_within_startup_budget():
+    summary, failures = budget.check(runs=3)
+    assert not failures, f"{failures} ({summary})"
+
+
+def test_lazy_modules_not_loaded_at_startup():
+    assert budget.measure()["lazy_loaded"] == []
@@ -1,41 +1,333 @@
 import os
 import hashlib
+import logging
+import threading
+from collections import OrderedDict
 import numpy as np
 from typing import Optional
 
-_CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "cache", "audio")
-os.makedirs(_CACHE_DIR, exist_ok=True)
+from core.config import (
+    AUDIO_CACHE_BACKEND,
+    AUDIO_CACHE_DIR,
+    AUDIO_CACHE_MEM_BYTES,
+    AUDIO_CACHE_DISK_BYTES,
+    AUDIO_PACK_SEGMENT_BYTES,
+)
+from core.metrics import REGISTRY
+from .codecs import SOURCE_SR
+from .pack_store import PackStore
 
-def _key(text: str, voice: str = "default") -> str:
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _key(text: str, voice: str = "default", variant: Optional[str] = None) -> str:
     h = hashlib.sha1()
     h.update(text.strip().encode("utf-8"))
     h.update(b"|")
     h.update(voice.encode("utf-8"))
+    if variant:
+        # Encoded copies (see tts.codecs) sit next to the canonical PCM.
+        h.update(b"|")
+        h.update(variant.encode("utf-8"))
     return h.hexdigest()
 
-def get(text: str, voice: str = "default") -> Optional[np.ndarray]:
-    path = os.path.join(_CACHE_DIR, f"{_key(text, voice)}.npy")
-    if not os.path.exists(path):
-        return None
-    try:
-        arr = np.load(path)
-        if isinstance(arr, np.ndarray) and arr.dtype == np.int16:
-            return arr
-    except Exception:
-        pass
-    return None
-
-def put(text: str, pcm_int16: np.ndarray, voice: str = "default") -> None:
-    if pcm_int16 is None or pcm_int16.size == 0:
-        return
-    path = os.path.join(_CACHE_DIR, f"{_key(text, voice)}.npy")
-    tmp = path + ".tmp"
-    try:
-        np.save(tmp, pcm_int16.astype(np.int16), allow_pickle=False)
-        os.replace(tmp, path)
-    except Exception:
+def _npy_entries(cache_dir: str) -> list:
+    found = []
+    with os.scandir(cache_dir) as it:
+        for e in it:
+            if e.name.endswith(".npy") and e.is_file():
+                st = e.stat()
+                found.append((st.st_mtime, e.name[:-4], max(st.st_size - _NPY_HEADER_BYTES, 0)))
+    return [(key, size) for _, key, size in sorted(found)]
+
+# np.save's (version 1.0) header for a 1-D array: magic, version and the
+# header dict, padded to 128 bytes. Sizes reported by FileTier exclude it.
+_NPY_HEADER_BYTES = 128
+
+class FileTier:
+    """Disk tier with one .npy file per key. Sizes are payload bytes."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def entries(self) -> list:
+        """(key, size) for every file, least recently written first."""
+        return _npy_entries(self.cache_dir)
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def read(self, key: str) -> Optional[np.ndarray]:
         try:
-            if os.path.exists(tmp):
-                os.remove(tmp)
+            arr = np.load(self._path(key))
         except Exception:
+            return None
+        return arr if isinstance(arr, np.ndarray) else None
+
+    def write(self, key: str, arr: np.ndarray) -> int:
+        path = self._path(key)
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.save(f, arr, allow_pickle=False)
+            os.replace(tmp, path)
+            return arr.nbytes
+        except Exception:
+            try:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            except Exception:
+                pass
+            raise
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
             pass
+
+    def maintenance(self) -> None:
+        pass
+
+class AudioCache:
+    """
+    Two-tier PCM cache:
+      - Memory: LRU of hot arrays, bounded by AUDIO_CACHE_MEM_BYTES.
+      - Disk: a FileTier (.npy per key) or PackStore (packed segments),
+        bounded by AUDIO_CACHE_DISK_BYTES, LRU eviction.
+    The disk LRU index lives in memory (rebuilt from the tier at startup), so
+    hits never stat the filesystem. Other worker processes may add or evict
+    entries behind our back; a miss checks the tier once and a failed read
+    counts as a miss.
+    """
+
+    def __init__(self, disk, mem_max_bytes: int, disk_max_bytes: int):
+        self.disk = disk
+        self.mem_max_bytes = mem_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self._lock = threading.Lock()
+        self._mem = OrderedDict()   # key -> np.ndarray
+        self._mem_bytes = 0
+        self._disk = OrderedDict()  # key -> file size, least recently used first
+        self._disk_bytes = 0
+        self._counters = dict.fromkeys(
+            ("mem_hits", "disk_hits", "misses", "puts", "mem_evictions", "disk_evictions"), 0
+        )
+        with self._lock:
+            for key, size in disk.entries():
+                self._disk[key] = size
+                self._disk_bytes += size
+            victims = self._evict_disk()
+        self._delete_from_disk(victims)
+
+    def get(self, text: str, voice: str = "default", variant: Optional[str] = None) -> Optional[np.ndarray]:
+        key = _key(text, voice, variant)
+        with self._lock:
+            arr = self._mem.get(key)
+            if arr is not None:
+                self._mem.move_to_end(key)
+                self._counters["mem_hits"] += 1
+                return arr
+            on_disk = key in self._disk
+            if on_disk:
+                self._disk.move_to_end(key)
+
+        if not on_disk and not self.disk.contains(key):
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+        arr = self.disk.read(key)
+        if arr is not None and arr.dtype != (np.uint8 if variant else np.int16):
+            arr = None
+
+        victims = ()
+        with self._lock:
+            if arr is None:
+                self._counters["misses"] += 1
+                self._forget_disk(key)
+                return None
+            self._counters["disk_hits"] += 1
+            if not on_disk:
+                victims = self._track_disk(key, arr.nbytes)
+            self._admit_mem(key, arr)
+        self._delete_from_disk(victims)
+        return arr
+
+    def get_hot(self, text: str, voice: str = "default", variant: Optional[str] = None) -> Optional[np.ndarray]:
+        """Memory tier only: never touches the disk, so it is safe on the event loop."""
+        key = _key(text, voice, variant)
+        with self._lock:
+            arr = self._mem.get(key)
+            if arr is not None:
+                self._mem.move_to_end(key)
+                self._counters["mem_hits"] += 1
+            return arr
+
+    def put(self, text: str, pcm_int16: np.ndarray, voice: str = "default", variant: Optional[str] = None) -> None:
+        """Stores canonical PCM16, or with `variant` set, an encoded payload (stored as bytes)."""
+        if pcm_int16 is None or pcm_int16.size == 0:
+            return
+        key = _key(text, voice, variant)
+        if variant:
+            pcm_int16 = np.ascontiguousarray(pcm_int16).view(np.uint8)
+        else:
+            pcm_int16 = pcm_int16.astype(np.int16, copy=False)
+        try:
+            size = self.disk.write(key, pcm_int16)
+        except Exception as e:
+            logger.warning(f"Audio cache write failed: {e}")
+            return
+        with self._lock:
+            self._counters["puts"] += 1
+            victims = self._track_disk(key, size)
+            self._admit_mem(key, pcm_int16)
+        self._delete_from_disk(victims)
+        self.disk.maintenance()
+
+    def import_files(self, cache_dir: str) -> int:
+        """
+        Moves .npy files left in `cache_dir` by the "files" backend into the
+        disk tier, oldest first, deleting each once stored. Each file is
+        claimed by renaming it first, so several workers can run this at once.
+        Returns the number of entries imported.
+        """
+        imported = 0
+        for key, _ in _npy_entries(cache_dir):
+            path = os.path.join(cache_dir, f"{key}.npy")
+            claimed = f"{path}.{os.getpid()}.import"
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue  # taken by another worker
+            try:
+                arr = np.load(claimed, allow_pickle=False)
+                if arr.dtype in (np.int16, np.uint8) and arr.size:
+                    size = self.disk.write(key, arr)
+                    with self._lock:
+                        victims = self._track_disk(key, size)
+                    self._delete_from_disk(victims)
+                    imported += 1
+            except Exception as e:
+                logger.warning(f"Could not import cached audio {path}: {e}")
+            finally:
+                os.remove(claimed)
+        if imported:
+            logger.info(f"Imported {imported} audio files from {cache_dir} into the {type(self.disk).__name__}.")
+        return imported
+
+    def duration_ms(self, text: str, voice: str = "default") -> Optional[float]:
+        """Length of the cached PCM for text, from tier sizes (no read, no LRU touch)."""
+        key = _key(text, voice)
+        with self._lock:
+            arr = self._mem.get(key)
+            size = arr.nbytes if arr is not None else self._disk.get(key)
+        return None if size is None else size / 2 * 1000 / SOURCE_SR
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._counters["mem_hits"] + self._counters["disk_hits"] + self._counters["misses"]
+            hits = self._counters["mem_hits"] + self._counters["disk_hits"]
+            return {
+                **self._counters,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "mem_entries": len(self._mem),
+                "mem_bytes": self._mem_bytes,
+                "mem_max_bytes": self.mem_max_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.disk_max_bytes,
+            }
+
+    # --- internals (call with self._lock held) ---
+
+    def _admit_mem(self, key: str, arr: np.ndarray) -> None:
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_bytes -= old.nbytes
+        if arr.nbytes > self.mem_max_bytes:
+            return
+        self._mem[key] = arr
+        self._mem_bytes += arr.nbytes
+        while self._mem_bytes > self.mem_max_bytes and self._mem:
+            _, evicted = self._mem.popitem(last=False)
+            self._mem_bytes -= evicted.nbytes
+            self._counters["mem_evictions"] += 1
+
+    def _track_disk(self, key: str, size: int) -> list:
+        """Returns keys evicted to make room; delete them with _delete_from_disk() after unlocking."""
+        self._disk_bytes -= self._disk.pop(key, 0)
+        self._disk[key] = size
+        self._disk_bytes += size
+        return self._evict_disk()
+
+    def _forget_disk(self, key: str) -> None:
+        self._disk_bytes -= self._disk.pop(key, 0)
+
+    def _evict_disk(self) -> list:
+        victims = []
+        while self._disk_bytes > self.disk_max_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self._counters["disk_evictions"] += 1
+            victims.append(key)
+        return victims
+
+    # --- (call without self._lock) ---
+
+    def _delete_from_disk(self, keys) -> None:
+        """Deletes evicted keys from the tier; file unlinks and pack tombstones stay outside the lock."""
+        for key in keys:
+            with self._lock:
+                if key in self._disk:
+                    continue  # written again since it was evicted
+            self.disk.delete(key)
+
+def _make_disk_tier(kind: str, root: str):
+    if kind == "pack":
+        return PackStore(os.path.join(root, "pack"), AUDIO_PACK_SEGMENT_BYTES)
+    if kind == "files":
+        return FileTier(root)
+    raise ValueError(f"Unknown AUDIO_CACHE_BACKEND: {kind}")
+
+AUDIO_CACHE = AudioCache(
+    _make_disk_tier(AUDIO_CACHE_BACKEND, AUDIO_CACHE_DIR), AUDIO_CACHE_MEM_BYTES, AUDIO_CACHE_DISK_BYTES
+)
+
+if AUDIO_CACHE_BACKEND == "pack":
+    # Installs that used the "files" backend have .npy files in AUDIO_CACHE_DIR;
+    # move them into the pack in the background instead of orphaning them.
+    threading.Thread(target=AUDIO_CACHE.import_files, args=(AUDIO_CACHE_DIR,),
+                     name="audio-cache-import", daemon=True).start()
+
+def get(text: str, voice: str = "default", variant: Optional[str] = None) -> Optional[np.ndarray]:
+    return AUDIO_CACHE.get(text, voice, variant)
+
+def get_hot(text: str, voice: str = "default", variant: Optional[str] = None) -> Optional[np.ndarray]:
+    return AUDIO_CACHE.get_hot(text, voice, variant)
+
+def put(text: str, pcm_int16: np.ndarray, voice: str = "default", variant: Optional[str] = None) -> None:
+    AUDIO_CACHE.put(text, pcm_int16, voice, variant)
+
+def duration_ms(text: str, voice: str = "default") -> Optional[float]:
+    return AUDIO_CACHE.duration_ms(text, voice)
+
+def stats() -> dict:
+    return AUDIO_CACHE.stats()
+
+def _collect_metrics():
+    s = AUDIO_CACHE.stats()
+    yield ("tts_reader_audio_cache_lookups_total", "counter", "Audio cache lookups by the tier that served them.",
+           [({"result": "mem_hit"}, s["mem_hits"]), ({"result": "disk_hit"}, s["disk_hits"]),
+            ({"result": "miss"}, s["misses"])])
+    yield ("tts_reader_audio_cache_evictions_total", "counter", "Audio cache evictions per tier.",
+           [({"tier": "mem"}, s["mem_evictions"]), ({"tier": "disk"}, s["disk_evictions"])])
+    yield ("tts_reader_audio_cache_bytes", "gauge", "Audio cache size per tier.",
+           [({"tier": "mem"}, s["mem_bytes"]), ({"tier": "disk"}, s["disk_bytes"])])
+    yield ("tts_reader_audio_cache_entries", "gauge", "Audio cache entries per tier.",
+           [({"tier": "mem"}, s["mem_entries"]), ({"tier": "disk"}, s["disk_entries"])])
+
+REGISTRY.register_collector(_collect_metrics)
@@ -0,0 +1,220 @@
+"""
+Wire codecs for /api/stream audio.
+
+Everything upstream of the socket is canonical PCM16 mono at 48 kHz. A codec
+turns a sentence of that into the payload sent to the client:
+  - pcm16               48 kHz PCM16 LE (default, no work)
+  - pcm16_24k/pcm16_16k downsampled PCM16 LE
+  - mulaw_24k/mulaw_16k downsampled G.711 mu-law, one byte per sample
+  - opus                48 kHz Opus, only when `opuslib` is installed
+
+Encoded payloads are numpy arrays (int16 for PCM, uint8 otherwise) so they
+can live in the audio cache next to the PCM. Opus payloads are a run of
+packets, each prefixed with its length as uint16 LE.
+"""
+import logging
+import numpy as np
+
+from core.config import OPUS_BITRATE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SOURCE_SR = 48000
+FRAME_MS = 20
+
+
+def _lowpass_taps(factor: int, num_taps: int = 63) -> np.ndarray:
+    """Windowed-sinc anti-aliasing filter for decimation by `factor`."""
+    cutoff = 0.45 / factor  # cycles/sample, a little under the new Nyquist
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(num_taps)
+    return taps / taps.sum()
+
+
+def _decimate(pcm: np.ndarray, factor: int) -> np.ndarray:
+    if factor == 1:
+        return pcm
+    filtered = np.convolve(pcm.astype(np.float32), _TAPS[factor], mode="same")
+    return np.clip(np.rint(filtered[::factor]), -32768, 32767).astype(np.int16)
+
+
+_TAPS = {2: _lowpass_taps(2), 3: _lowpass_taps(3)}
+
+_MULAW_BIAS = 0x84
+_MULAW_CLIP = 32635
+
+
+def mulaw_encode(pcm: np.ndarray) -> np.ndarray:
+    """G.711 mu-law, vectorized."""
+    x = pcm.astype(np.int32)
+    sign = np.where(x < 0, 0x80, 0)
+    x = np.minimum(np.abs(x), _MULAW_CLIP) + _MULAW_BIAS
+    exponent = np.floor(np.log2(x)).astype(np.int32) - 7
+    mantissa = (x >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+
+
+def mulaw_decode(data: np.ndarray) -> np.ndarray:
+    u = ~data.astype(np.int32) & 0xFF
+    exponent = (u >> 4) & 0x07
+    mantissa = u & 0x0F
+    x = (((mantissa << 3) + _MULAW_BIAS) << exponent) - _MULAW_BIAS
+    return np.where(u & 0x80, -x, x).astype(np.int16)
+
+
+class Codec:
+    """A wire format. `encode` takes 48 kHz PCM16 and returns the payload array."""
+
+    name = "pcm16"
+    sample_rate = SOURCE_SR
+    bytes_per_sample = 2
+    factor = 1
+
+    def encode(self, pcm: np.ndarray) -> np.ndarray:
+        return _decimate(pcm, self.factor)
+
+    def decode(self, payload: np.ndarray) -> np.ndarray:
+        return payload.view(np.int16)
+
+    def num_samples(self, payload: np.ndarray) -> int:
+        """Samples (at `sample_rate`) the client gets from a payload."""
+        return payload.nbytes // self.bytes_per_sample
+
+    def frames(self, payload: np.ndarray, frames_per_packet: int = 1):
+        """
+        Splits a payload into messages of `frames_per_packet` FRAME_MS frames.
+        Yields memoryviews into the payload: no copies, so the payload (often
+        a cached or memory-mapped array) must not be mutated while sending.
+        """
+        data = memoryview(np.ascontiguousarray(payload)).cast("B")
+        step = self.sample_rate * FRAME_MS // 1000 * self.bytes_per_sample * frames_per_packet
+        for i in range(0, len(data), step):
+            yield data[i:i + step]
+
+    def skip(self, payload: np.ndarray, ms: float) -> np.ndarray:
+        """Drops the first `ms` of audio (for seeking into a sentence)."""
+        start = int(ms * self.sample_rate / 1000) * self.bytes_per_sample
+        return payload.view(np.uint8)[start:]
+
+    def hello(self) -> dict:
+        return {"codec": self.name, "sample_rate": self.sample_rate, "channels": 1}
+
+
+class PCM16(Codec):
+    def __init__(self, name: str, sample_rate: int):
+        self.name = name
+        self.sample_rate = sample_rate
+        self.factor = SOURCE_SR // sample_rate
+
+
+class MuLaw(Codec):
+    bytes_per_sample = 1
+
+    def __init__(self, name: str, sample_rate: int):
+        self.name = name
+        self.sample_rate = sample_rate
+        self.factor = SOURCE_SR // sample_rate
+
+    def encode(self, pcm: np.ndarray) -> np.ndarray:
+        return mulaw_encode(_decimate(pcm, self.factor))
+
+    def decode(self, payload: np.ndarray) -> np.ndarray:
+        return mulaw_decode(payload)
+
+
+class Opus(Codec):
+    """20 ms Opus packets at 48 kHz, length-prefixed (uint16 LE)."""
+
+    name = "opus"
+    frame_samples = SOURCE_SR * FRAME_MS // 1000
+
+    def __init__(self, bitrate: int):
+        import opuslib
+
+        self._opuslib = opuslib
+        self.bitrate = bitrate
+
+    def _encoder(self):
+        # Encoders carry state between packets; one per sentence keeps
+        # sentences independently cacheable.
+        enc = self._opuslib.Encoder(SOURCE_SR, 1, self._opuslib.APPLICATION_VOIP)
+        enc.bitrate = self.bitrate
+        return enc
+
+    def encode(self, pcm: np.ndarray) -> np.ndarray:
+        enc = self._encoder()
+        n = self.frame_samples
+        padded = np.zeros(-(-pcm.size // n) * n, dtype=np.int16)
+        padded[:pcm.size] = pcm
+        out = bytearray()
+        for i in range(0, padded.size, n):
+            packet = enc.encode(padded[i:i + n].tobytes(), n)
+            out += len(packet).to_bytes(2, "little") + packet
+        return np.frombuffer(bytes(out), dtype=np.uint8)
+
+    def decode(self, payload: np.ndarray) -> np.ndarray:
+        dec = self._opuslib.Decoder(SOURCE_SR, 1)
+        pcm = [np.frombuffer(dec.decode(p[2:].tobytes(), self.frame_samples), dtype=np.int16)
+               for p in self.frames(payload)]
+        return np.concatenate(pcm) if pcm else np.zeros(0, dtype=np.int16)
+
+    def num_samples(self, payload: np.ndarray) -> int:
+        return sum(1 for _ in self.frames(payload)) * self.frame_samples
+
+    def frames(self, payload: np.ndarray, frames_per_packet: int = 1):
+        """Whole length-prefixed packets, `frames_per_packet` to a message."""
+        data = memoryview(np.ascontiguousarray(payload)).cast("B")
+        start = i = count = 0
+        while i + 2 <= len(data):
+            i += 2 + data[i] + (data[i + 1] << 8)
+            count += 1
+            if count == frames_per_packet:
+                yield data[start:i]
+                start, count = i, 0
+        if start < i:
+            yield data[start:i]
+
+    def skip(self, payload: np.ndarray, ms: float) -> np.ndarray:
+        """Drops whole packets, so seeks land on a 20 ms boundary."""
+        start = 0
+        for i, packet in zip(range(int(ms // FRAME_MS)), self.frames(payload)):
+            start += len(packet)
+        return payload.view(np.uint8)[start:]
+
+    def hello(self) -> dict:
+        return {**super().hello(), "framing": "len16"}
+
+
+def _build_codecs() -> dict:
+    codecs = {
+        "pcm16": PCM16("pcm16", 48000),
+        "pcm16_24k": PCM16("pcm16_24k", 24000),
+        "pcm16_16k": PCM16("pcm16_16k", 16000),
+        "mulaw_24k": MuLaw("mulaw_24k", 24000),
+        "mulaw_16k": MuLaw("mulaw_16k", 16000),
+    }
+    try:
+        codecs["opus"] = Opus(OPUS_BITRATE)
+    except Exception as e:  # opuslib missing, or libopus not found
+        logger.info(f"Opus codec unavailable: {e}")
+    return codecs
+
+
+CODECS = _build_codecs()
+DEFAULT_CODEC = "pcm16"
+
+
+def negotiate(offer) -> Codec:
+    """
+    Picks the first supported codec from the client's offer: a name, a
+    comma-separated string (query params) or a list in preference order.
+    Falls back to PCM16 at 48 kHz.
+    """
+    if isinstance(offer, str):
+        offer = offer.split(",")
+    for name in offer or ():
+        codec = CODECS.get(str(name).strip().lower())
+        if codec is not None:
+            return codec
+    return CODECS[DEFAULT_CODEC]
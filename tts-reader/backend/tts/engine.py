@@ -1,49 +1,219 @@
+import asyncio
 import logging
+import threading
+import time
 import numpy as np
 from typing import Optional
 
-from .providers.gtts_provider import GTTSProvider
+from core.config import TTS_PROVIDER
+from core.metrics import REGISTRY, SYNTH_SECONDS
+from .providers import make_provider
 from .providers.exceptions import RateLimitedError
-from .cache import get as cache_get, put as cache_put
+from .cache import _key as cache_key, get as cache_get, get_hot as cache_get_hot, put as cache_put
+from .codecs import DEFAULT_CODEC
+from .gateway import ProviderGateway
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_EMPTY = np.zeros(0, dtype=np.int16)
+
 class TTS:
     """
     Thin orchestration layer:
       - First check cache.
-      - Else call provider (returns PCM16 @ 48k mono).
+      - Else call provider (returns PCM16 @ 48k mono; chosen by TTS_PROVIDER)
+        through the gateway, which caps concurrency, rate-limits and backs
+        off on 429s.
       - On success, write to cache.
       - On provider RateLimitedError, bubble up (streamer will handle).
+    The async methods are for the event loop: only the in-memory cache tier
+    is checked on the loop, disk lookups run in the default executor, and
+    provider waits happen on the gateway's own executor.
+    Concurrent misses for the same text + voice share one provider call
+    (single flight), whether they come from sync or async callers.
     """
 
-    def __init__(self, provider: Optional[object] = None):
-        self.provider = provider or GTTSProvider()
+    def __init__(self, provider: Optional[object] = None, gateway: Optional[ProviderGateway] = None):
+        self.gateway = gateway or ProviderGateway(provider or make_provider(TTS_PROVIDER))
+        self._flights = {}  # cache key -> _Flight
+        # Reentrant: cancelling a future runs _land() on this thread, under the lock.
+        self._flights_lock = threading.RLock()
+        self._flight_counters = {"started": 0, "coalesced": 0}
+
+    @property
+    def provider(self):
+        return self.gateway.provider
+
+    @provider.setter
+    def provider(self, provider):
+        self.gateway.provider = provider
+
+    def synthesize_encoded(self, text: str, codec, rate: float = 1.0, voice: str = "default") -> np.ndarray:
+        """
+        synthesize() followed by codec.encode(). Encoded payloads are cached
+        as their own variant, so a repeat listener on the same codec skips
+        both the provider and the encoder.
+        """
+        if codec.name == DEFAULT_CODEC:
+            return self.synthesize(text, rate, voice)
+        text_norm = text.strip()
+        cached = cache_get(text_norm, voice, codec.name) if text_norm else None
+        if cached is not None:
+            return cached
+        return self._encode(text_norm, self.synthesize(text_norm, rate, voice), codec, voice)
+
+    async def asynthesize_encoded(self, text: str, codec, rate: float = 1.0, voice: str = "default") -> np.ndarray:
+        """Async synthesize_encoded(); encoding runs in the default executor."""
+        if codec.name == DEFAULT_CODEC:
+            return await self.asynthesize(text, rate, voice)
+        text_norm = text.strip()
+        cached = await _acache_get(text_norm, voice, codec.name) if text_norm else None
+        if cached is not None:
+            return cached
+        pcm = await self.asynthesize(text_norm, rate, voice)
+        return await asyncio.get_running_loop().run_in_executor(None, self._encode, text_norm, pcm, codec, voice)
 
     def synthesize(self, text: str, rate: float = 1.0, voice: str = "default") -> np.ndarray:
         # We deliberately ignore `rate` here; tempo is client-side to preserve pitch.
         text_norm = text.strip()
         if not text_norm:
-            return np.zeros(0, dtype=np.int16)
+            return _EMPTY
 
         # 1) Cache first
         cached = cache_get(text_norm, voice)
         if cached is not None:
             return cached
 
-        # 2) Provider
+        # 2) Provider (blocks this thread until the gateway runs the call);
+        # 3) the result is cached as the call completes
+        flight = self._join(text_norm, voice)
+        t0 = time.perf_counter()
         try:
-            pcm = self.provider.synth(text_norm, voice=voice)
-            if pcm is None or pcm.size == 0:
-                return np.zeros(0, dtype=np.int16)
-            # 3) Save cache
+            pcm = flight.future.result()
+        except Exception as e:
+            return self._failed(text_norm, e)
+        finally:
+            SYNTH_SECONDS.observe(time.perf_counter() - t0)
+            self._leave(flight)
+        return pcm if pcm is not None and pcm.size else _EMPTY
+
+    async def asynthesize(self, text: str, rate: float = 1.0, voice: str = "default") -> np.ndarray:
+        """Async synthesize(); the caller awaits instead of holding a thread."""
+        text_norm = text.strip()
+        if not text_norm:
+            return _EMPTY
+
+        cached = await _acache_get(text_norm, voice)
+        if cached is not None:
+            return cached
+
+        flight = self._join(text_norm, voice)
+        t0 = time.perf_counter()
+        try:
+            # Shielded: one waiter going away must not cancel the shared call.
+            pcm = await asyncio.shield(asyncio.wrap_future(flight.future))
+            SYNTH_SECONDS.observe(time.perf_counter() - t0)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            SYNTH_SECONDS.observe(time.perf_counter() - t0)
+            return self._failed(text_norm, e)
+        finally:
+            self._leave(flight)
+        return pcm if pcm is not None and pcm.size else _EMPTY
+
+    def _join(self, text_norm: str, voice: str) -> "_Flight":
+        """
+        Returns the in-flight provider call for this text + voice, starting one
+        if there is none. The result is cached from the gateway thread as soon
+        as it lands (before any waiter wakes), so audio is kept even if every
+        caller has gone away.
+        """
+        key = cache_key(text_norm, voice)
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            if flight is not None and not flight.future.cancelled():
+                flight.waiters += 1
+                self._flight_counters["coalesced"] += 1
+                return flight
+            self._flight_counters["started"] += 1
+            fut = self.gateway.submit(text_norm, voice)
+            flight = self._flights[key] = _Flight(key, fut)
+        fut.add_done_callback(lambda f: self._land(flight, text_norm, voice))
+        return flight
+
+    def _leave(self, flight: "_Flight") -> None:
+        with self._flights_lock:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.future.done():
+                flight.future.cancel()  # nobody wants it; drop it if still queued
+
+    def _land(self, flight: "_Flight", text_norm: str, voice: str) -> None:
+        self._cache_result(text_norm, voice, flight.future)
+        with self._flights_lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    def _cache_result(self, text_norm: str, voice: str, fut) -> None:
+        if fut.cancelled() or fut.exception() is not None:
+            return
+        pcm = fut.result()
+        if pcm is not None and pcm.size:
             cache_put(text_norm, pcm, voice)
+
+    def _encode(self, text_norm: str, pcm: np.ndarray, codec, voice: str) -> np.ndarray:
+        if pcm.size == 0:
             return pcm
-        except RateLimitedError as e:
+        payload = codec.encode(pcm)
+        cache_put(text_norm, payload, voice, codec.name)
+        return payload
+
+    def _failed(self, text_norm: str, e: Exception) -> np.ndarray:
+        if isinstance(e, RateLimitedError):
             # Surface for the stream loop to tag the mark as rate_limited
             logger.warning(f"TTS rate-limited for text: '{text_norm[:50]}...' : {e}")
-            raise
-        except Exception as e:
-            logger.error(f"TTS synth failed for text: '{text_norm[:50]}...' : {e}")
-            return np.zeros(0, dtype=np.int16)
+            raise e
+        logger.error(f"TTS synth failed for text: '{text_norm[:50]}...' : {e}")
+        return _EMPTY
+
+    def stats(self) -> dict:
+        with self._flights_lock:
+            single_flight = {**self._flight_counters, "inflight": len(self._flights)}
+        return {"gateway": self.gateway.stats(), "single_flight": single_flight}
+
+async def _acache_get(text_norm: str, voice: str, variant: Optional[str] = None) -> Optional[np.ndarray]:
+    """Cache lookup from the event loop: the memory tier inline, the disk tier off-loop."""
+    cached = cache_get_hot(text_norm, voice, variant)
+    if cached is not None:
+        return cached
+    return await asyncio.get_running_loop().run_in_executor(None, cache_get, text_norm, voice, variant)
+
+class _Flight:
+    __slots__ = ("key", "future", "waiters")
+
+    def __init__(self, key: str, future):
+        self.key = key
+        self.future = future
+        self.waiters = 1
+
+# Shared by the stream routes and background pre-render, so both draw on one
+# gateway and coalesce through one set of in-flight calls.
+TTS_ENGINE = TTS()
+
+def _collect_metrics():
+    stats = TTS_ENGINE.stats()
+    gw, sf = stats["gateway"], stats["single_flight"]
+    yield ("tts_reader_provider_calls_total", "counter", "Provider call attempts by result.",
+           [({"result": "ok"}, gw["ok"]), ({"result": "rate_limited"}, gw["rate_limited"]),
+            ({"result": "error"}, gw["errors"])])
+    yield "tts_reader_provider_retries_total", "counter", "Provider call retries.", [({}, gw["retries"])]
+    yield ("tts_reader_provider_queue_depth", "gauge", "Provider calls waiting for a gateway slot.",
+           [({}, gw["queued"])])
+    yield "tts_reader_provider_running", "gauge", "Provider calls in progress.", [({}, gw["running"])]
+    yield ("tts_reader_provider_cooldown_seconds", "gauge", "Remaining rate-limit cooldown.",
+           [({}, gw["cooldown_remaining_s"])])
+    yield ("tts_reader_synth_flights_total", "counter", "Synthesis cache misses, by whether they joined a call in flight.",
+           [({"kind": "started"}, sf["started"]), ({"kind": "coalesced"}, sf["coalesced"])])
+
+REGISTRY.register_collector(_collect_metrics)
@@ -0,0 +1,197 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from core.config import (
+    PROVIDER_BURST,
+    PROVIDER_COOLDOWN_MAX_S,
+    PROVIDER_COOLDOWN_S,
+    PROVIDER_MAX_CONCURRENCY,
+    PROVIDER_MAX_RETRIES,
+    PROVIDER_RATE_PER_S,
+)
+from core.metrics import PROVIDER_SECONDS
+from .providers.exceptions import RateLimitedError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket. rate <= 0 disables it."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes a token and returns how long to wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= 1.0
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def available(self) -> float:
+        """Tokens available now, without taking one."""
+        if self.rate <= 0:
+            return self.burst
+        with self._lock:
+            return min(self.burst, self._tokens + (time.monotonic() - self._stamp) * self.rate)
+
+
+class ProviderGateway:
+    """
+    Process-wide front door to a TTSProvider:
+      - at most `max_concurrency` provider calls at once, run on a dedicated
+        executor of that size (provider waits never hold shared threads);
+      - a token bucket on the request rate;
+      - a shared cooldown after a RateLimitedError: every queued call waits
+        it out instead of hammering the provider, and it doubles on
+        consecutive 429s (capped) and resets on success.
+    Calls are retried up to `max_retries` times; backoff happens here, so
+    providers should make a single attempt per synth() call.
+    """
+
+    def __init__(
+        self,
+        provider,
+        max_concurrency: int = PROVIDER_MAX_CONCURRENCY,
+        rate_per_s: float = PROVIDER_RATE_PER_S,
+        burst: float = PROVIDER_BURST,
+        cooldown_s: float = PROVIDER_COOLDOWN_S,
+        cooldown_max_s: float = PROVIDER_COOLDOWN_MAX_S,
+        max_retries: int = PROVIDER_MAX_RETRIES,
+    ):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(rate_per_s, burst)
+        self.cooldown_s = cooldown_s
+        self.cooldown_max_s = cooldown_max_s
+        self.max_retries = max_retries
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="tts-provider")
+        self._lock = threading.Lock()
+        self._cooldown_until = 0.0
+        self._strikes = 0  # consecutive rate-limited responses
+        self._counters = dict.fromkeys(("calls", "ok", "rate_limited", "errors", "retries"), 0)
+        self._queued = 0
+        self._running = 0
+
+    def submit(self, text: str, voice: str = "default") -> Future:
+        """Queues a synthesis; the Future resolves to PCM16 or raises."""
+        with self._lock:
+            self._queued += 1
+        fut = self._executor.submit(self._run, text, voice)
+        fut.add_done_callback(self._dequeue_cancelled)
+        return fut
+
+    def synth(self, text: str, voice: str = "default") -> np.ndarray:
+        """Blocking form of submit(), for callers already off the event loop."""
+        return self.submit(text, voice).result()
+
+    def has_capacity(self, reserve: int = 0) -> bool:
+        """
+        True when a call submitted now would start at once and still leave
+        `reserve` slots idle: nothing queued, no cooldown, a token to spend.
+        Lets background work stay out of the way of live callers.
+        """
+        reserve = min(reserve, self.max_concurrency - 1)
+        with self._lock:
+            if self._queued or self._running + reserve >= self.max_concurrency:
+                return False
+            if self._cooldown_until > time.monotonic():
+                return False
+        return self.bucket.available() >= 1.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._counters,
+                "queued": self._queued,
+                "running": self._running,
+                "max_concurrency": self.max_concurrency,
+                "cooldown_remaining_s": round(max(0.0, self._cooldown_until - time.monotonic()), 3),
+            }
+
+    def _dequeue_cancelled(self, fut: Future) -> None:
+        if fut.cancelled():  # dropped before it ran
+            with self._lock:
+                self._queued -= 1
+
+    def _run(self, text: str, voice: str) -> np.ndarray:
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            return self._call_with_retries(text, voice)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _call_with_retries(self, text: str, voice: str) -> np.ndarray:
+        last_err: Optional[Exception] = None
+        for attempt in range(self.max_retries):
+            if attempt:
+                self._count("retries")
+            self._wait_for_cooldown()
+            delay = self.bucket.reserve()
+            if delay:
+                time.sleep(delay)
+            self._count("calls")
+            t0 = time.perf_counter()
+            try:
+                pcm = self.provider.synth(text, voice=voice)
+            except RateLimitedError as e:
+                PROVIDER_SECONDS.observe(time.perf_counter() - t0, outcome="rate_limited")
+                last_err = e
+                self._count("rate_limited")
+                self._start_cooldown()
+                continue
+            except Exception as e:
+                PROVIDER_SECONDS.observe(time.perf_counter() - t0, outcome="error")
+                last_err = e
+                self._count("errors")
+                if attempt + 1 < self.max_retries:
+                    time.sleep(min(0.3 * (2 ** attempt), 4.0))
+                continue
+            PROVIDER_SECONDS.observe(time.perf_counter() - t0, outcome="ok")
+            with self._lock:
+                self._strikes = 0
+                self._counters["ok"] += 1
+            return pcm
+        if isinstance(last_err, RateLimitedError) or last_err is None:
+            raise RateLimitedError(str(last_err) if last_err else "TTS rate limited")
+        raise last_err
+
+    def _wait_for_cooldown(self) -> None:
+        while True:
+            with self._lock:
+                remaining = self._cooldown_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def _start_cooldown(self) -> None:
+        with self._lock:
+            self._strikes += 1
+            pause = min(self.cooldown_s * (2 ** (self._strikes - 1)), self.cooldown_max_s)
+            pause += random.uniform(0.0, 0.25 * pause)
+            until = time.monotonic() + pause
+            if until > self._cooldown_until:
+                self._cooldown_until = until
+                logger.warning(f"Provider rate-limited; cooling down for {pause:.1f}s")
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
@@ -0,0 +1,396 @@
+import fcntl
+import logging
+import os
+import struct
+import threading
+import zlib
+from typing import Optional
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Index record: key digest, op, dtype code, segment id, byte offset, byte
+# length, then a CRC32 of those fields so corrupt records can be detected
+_FIELDS = struct.Struct("<20sBBIQI")
+_RECORD = struct.Struct("<20sBBIQII")
+_LEGACY_INDEX = "index.log"  # same records without the CRC
+_OP_PUT = 1
+_OP_DELETE = 0
+_DTYPES = {0: np.dtype(np.int16), 1: np.dtype(np.uint8)}
+_DTYPE_CODES = {dt: code for code, dt in _DTYPES.items()}
+_ALIGN = 16  # payload alignment inside a segment, keeps int16 views aligned
+
+
+class PackStore:
+    """
+    Append-only packed store for audio arrays.
+
+    Payloads go into large segment files (`seg-000001.pack`, ...) and an
+    append-only `index-v2.log` maps each key to (segment, offset, length,
+    dtype). Records are fixed-size and checksummed; a torn record at the end
+    (a writer that died mid-append) is truncated away before the next append.
+    Deleting a key appends a tombstone; compact() copies the live entries of
+    mostly-dead segments into a new segment and removes the old files. The
+    copy runs without the store lock (maintenance() starts it on a
+    background thread), so reads and writes carry on meanwhile; only the
+    final swap of index entries is done under the lock.
+
+    Reads return zero-copy views into a read-only np.memmap of the segment.
+    Several worker processes can share a directory: writes take an flock on
+    the index, and a miss first replays index records appended by others.
+    """
+
+    def __init__(self, root: str, segment_bytes: int, compact_dead_ratio: float = 0.5):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.compact_dead_ratio = compact_dead_ratio
+        os.makedirs(root, exist_ok=True)
+        self._index_path = os.path.join(root, "index-v2.log")
+        self._lock = threading.Lock()
+        self._entries = {}      # digest -> (segment, offset, length, dtype code)
+        self._live_bytes = {}   # segment -> live payload bytes
+        self._maps = {}         # segment -> np.memmap
+        self._index_pos = 0
+        self._index_ino = None
+        self._active = max(self._segments() or [1])
+        self._dead_since_compact = 0
+        self._compacting = False
+        self._compact_lock = threading.Lock()  # one compaction at a time
+        if not os.path.exists(self._index_path):
+            self._migrate_legacy_index()
+        with open(self._index_path, "ab"):
+            pass
+        with self._lock:
+            self._replay_index()
+
+    # --- public API (keys are hex digests, as produced by tts.cache._key) ---
+
+    def entries(self) -> list:
+        """(key, length) for every live entry, oldest write first."""
+        with self._lock:
+            return [(digest.hex(), e[2]) for digest, e in self._entries.items()]
+
+    def contains(self, key: str) -> bool:
+        digest = bytes.fromhex(key)
+        with self._lock:
+            if digest not in self._entries:
+                self._replay_index()
+            return digest in self._entries
+
+    def read(self, key: str) -> Optional[np.ndarray]:
+        digest = bytes.fromhex(key)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self._replay_index()
+                entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            segment, offset, length, code = entry
+            try:
+                mm = self._map(segment, offset + length)
+            except OSError:
+                # Segment compacted away by another process; pick up its new location.
+                self._reload_index()
+                return None
+        return mm[offset:offset + length].view(_DTYPES[code])
+
+    def write(self, key: str, arr: np.ndarray) -> int:
+        """Appends arr's bytes and returns the payload size."""
+        code = _DTYPE_CODES[arr.dtype]
+        payload = np.ascontiguousarray(arr).tobytes()
+        digest = bytes.fromhex(key)
+        with self._lock, self._index_locked() as index:
+            self._replay_index(index)
+            _truncate_torn_tail(index)
+            segment, offset = self._append(payload)
+            index.write(_pack_record(digest, _OP_PUT, code, segment, offset, len(payload)))
+            index.flush()
+            self._index_pos = index.tell()
+            self._apply(digest, _OP_PUT, code, segment, offset, len(payload))
+        return len(payload)
+
+    def delete(self, key: str) -> None:
+        digest = bytes.fromhex(key)
+        with self._lock, self._index_locked() as index:
+            self._replay_index(index)
+            if digest not in self._entries:
+                return
+            _truncate_torn_tail(index)
+            index.write(_pack_record(digest, _OP_DELETE, 0, 0, 0, 0))
+            index.flush()
+            self._index_pos = index.tell()
+            self._apply(digest, _OP_DELETE, 0, 0, 0, 0)
+
+    def dead_ratio(self) -> float:
+        with self._lock:
+            total = sum(self._segment_size(s) for s in self._segments())
+            live = sum(self._live_bytes.values())
+        return 1.0 - live / total if total else 0.0
+
+    def maintenance(self) -> None:
+        """
+        Starts a background compaction of one segment once about half a
+        segment's worth has been deleted. Returns immediately: this runs on
+        the write path (provider completion callbacks).
+        """
+        with self._lock:
+            if self._compacting or self._dead_since_compact < self.segment_bytes // 2:
+                return
+            self._dead_since_compact = 0
+            self._compacting = True
+        threading.Thread(target=self._compact_in_background, name="pack-compact", daemon=True).start()
+
+    def _compact_in_background(self) -> None:
+        try:
+            self.compact(max_segments=1, min_dead_ratio=self.compact_dead_ratio)
+        except Exception as e:
+            logger.warning(f"Pack store compaction failed: {e}")
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def compact(self, max_segments: int = 1, min_dead_ratio: float = 0.5) -> int:
+        """
+        Rewrites up to `max_segments` sealed segments whose dead share is at
+        least `min_dead_ratio`. Their live entries are copied, without the
+        store lock, into a temporary file that then becomes a new segment;
+        under the lock, entries that were not overwritten or deleted in the
+        meantime are pointed at it, the old files are removed and the index
+        log is rewritten to hold only live entries. Returns bytes reclaimed.
+        """
+        with self._compact_lock:
+            # 1) Pick segments and snapshot their live entries.
+            with self._lock:
+                self._replay_index()
+                candidates = []
+                # The highest segment is the active one (see _append).
+                for segment in self._segments()[:-1]:
+                    size = self._segment_size(segment)
+                    dead = size - self._live_bytes.get(segment, 0)
+                    if size and dead / size >= min_dead_ratio:
+                        candidates.append((dead / size, segment, size))
+                chosen = sorted(candidates, reverse=True)[:max_segments]
+                if not chosen:
+                    return 0
+                sources = {segment: self._map(segment, size) for _, segment, size in chosen}
+                moved = [(d, e) for d, e in self._entries.items() if e[0] in sources]
+
+            # 2) Copy live payloads. Sealed segments are never written again,
+            # so this needs no lock.
+            tmp = os.path.join(self.root, f"compact-{os.getpid()}.tmp")
+            new_offsets = []
+            try:
+                with open(tmp, "wb") as f:
+                    for _, (segment, offset, length, _) in moved:
+                        pad = -f.tell() % _ALIGN
+                        if pad:
+                            f.write(b"\0" * pad)
+                        new_offsets.append(f.tell())
+                        f.write(sources[segment][offset:offset + length])
+                    copied = f.tell()
+            except Exception:
+                os.remove(tmp)
+                raise
+
+            # 3) Swap the entries over.
+            with self._lock, self._index_locked() as index:
+                self._replay_index(index)
+                if copied:
+                    previous = max(self._segments() + [self._active])
+                    new_segment = previous + 1
+                    os.replace(tmp, self._segment_path(new_segment))
+                    # The compacted segment is sealed: appends (from every
+                    # process, see _append) continue in a fresh one after it.
+                    if not self._segment_size(previous):
+                        try:
+                            os.remove(self._segment_path(previous))  # unused active left by the last compaction
+                        except FileNotFoundError:
+                            pass
+                    self._active = new_segment + 1
+                    open(self._segment_path(self._active), "ab").close()
+                else:
+                    os.remove(tmp)
+                for (digest, entry), new_offset in zip(moved, new_offsets):
+                    if self._entries.get(digest) != entry:
+                        continue  # overwritten or deleted while copying
+                    self._entries[digest] = (new_segment, new_offset, entry[2], entry[3])
+                    self._live_bytes[new_segment] = self._live_bytes.get(new_segment, 0) + entry[2]
+                reclaimed = sum(size for _, _, size in chosen) - copied
+                for _, segment, _ in chosen:
+                    self._maps.pop(segment, None)
+                    self._live_bytes.pop(segment, None)
+                    try:
+                        os.remove(self._segment_path(segment))
+                    except FileNotFoundError:
+                        pass  # compacted by another process meanwhile
+                self._rewrite_index()
+        logger.info(f"Pack store compaction reclaimed {reclaimed} bytes.")
+        return reclaimed
+
+    # --- internals (call with self._lock held) ---
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.root, f"seg-{segment:06d}.pack")
+
+    def _segments(self) -> list:
+        return sorted(
+            int(name[4:10]) for name in os.listdir(self.root)
+            if name.startswith("seg-") and name.endswith(".pack")
+        )
+
+    def _segment_size(self, segment: int) -> int:
+        try:
+            return os.path.getsize(self._segment_path(segment))
+        except OSError:
+            return 0
+
+    def _map(self, segment: int, needed: int) -> np.memmap:
+        mm = self._maps.get(segment)
+        if mm is None or mm.size < needed:
+            # The active segment grows; remap once a read goes past the old end.
+            mm = np.memmap(self._segment_path(segment), dtype=np.uint8, mode="r")
+            self._maps[segment] = mm
+        return mm
+
+    def _append(self, payload: bytes):
+        """Writes payload to the active segment, rolling over when full."""
+        # The highest segment is the active one; another process may have
+        # rolled over or compacted since our last write.
+        self._active = max([self._active] + self._segments())
+        if self._segment_size(self._active) + len(payload) > self.segment_bytes and self._segment_size(self._active):
+            self._active += 1
+        with open(self._segment_path(self._active), "ab") as f:
+            offset = f.tell()
+            pad = -offset % _ALIGN
+            if pad:
+                f.write(b"\0" * pad)
+                offset += pad
+            f.write(payload)
+        return self._active, offset
+
+    def _apply(self, digest, op, code, segment, offset, length) -> None:
+        old = self._entries.pop(digest, None)
+        if old is not None:
+            self._live_bytes[old[0]] = self._live_bytes.get(old[0], 0) - old[2]
+            self._dead_since_compact += old[2]
+        if op == _OP_PUT:
+            self._entries[digest] = (segment, offset, length, code)
+            self._live_bytes[segment] = self._live_bytes.get(segment, 0) + length
+            self._active = max(self._active, segment)
+
+    def _replay_index(self, index=None) -> None:
+        """Applies index records appended since the last replay (by any process)."""
+        try:
+            st = os.stat(self._index_path)
+        except OSError:
+            return
+        if self._index_ino is not None and st.st_ino != self._index_ino:
+            # Rewritten by a compaction elsewhere: start over.
+            self._reload_state()
+        self._index_ino = st.st_ino
+        if st.st_size <= self._index_pos:
+            return
+        if index is not None:
+            index.seek(self._index_pos)
+            data = index.read()
+        else:
+            with open(self._index_path, "rb") as f:
+                f.seek(self._index_pos)
+                data = f.read()
+        usable = len(data) - len(data) % _RECORD.size
+        corrupt = 0
+        for pos in range(0, usable, _RECORD.size):
+            *fields, crc = _RECORD.unpack_from(data, pos)
+            if zlib.crc32(data[pos:pos + _FIELDS.size]) != crc:
+                corrupt += 1
+                continue
+            self._apply(*fields)
+        if corrupt:
+            logger.warning(f"Pack store index: skipped {corrupt} corrupt record(s) in {self._index_path}")
+        self._index_pos += usable
+
+    def _reload_state(self) -> None:
+        self._entries.clear()
+        self._live_bytes.clear()
+        self._maps.clear()
+        self._index_pos = 0
+
+    def _reload_index(self) -> None:
+        self._reload_state()
+        self._index_ino = None
+        self._replay_index()
+
+    def _rewrite_index(self) -> None:
+        tmp = self._index_path + ".tmp"
+        with open(tmp, "wb") as f:
+            for digest, (segment, offset, length, code) in self._entries.items():
+                f.write(_pack_record(digest, _OP_PUT, code, segment, offset, length))
+            pos = f.tell()
+        os.replace(tmp, self._index_path)
+        self._index_pos = pos
+        self._index_ino = os.stat(self._index_path).st_ino
+
+    def _index_locked(self):
+        return _LockedFile(self._index_path)
+
+    def _migrate_legacy_index(self) -> None:
+        """Rewrites an index.log from before record checksums in the current format."""
+        legacy = os.path.join(self.root, _LEGACY_INDEX)
+        try:
+            with open(legacy, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        data = data[:len(data) - len(data) % _FIELDS.size]
+        tmp = f"{self._index_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            for fields in _FIELDS.iter_unpack(data):
+                f.write(_pack_record(*fields))
+        os.replace(tmp, self._index_path)
+        try:
+            os.remove(legacy)
+        except FileNotFoundError:
+            pass  # another worker migrated it at the same time
+        logger.info(f"Pack store: migrated {len(data) // _FIELDS.size} index records from {legacy}")
+
+
+def _pack_record(*fields) -> bytes:
+    body = _FIELDS.pack(*fields)
+    return body + struct.pack("<I", zlib.crc32(body))
+
+
+def _truncate_torn_tail(index) -> None:
+    """
+    Cuts a partial record off the end of the (flocked) index, so the next
+    record starts on a record boundary for every reader.
+    """
+    size = os.fstat(index.fileno()).st_size
+    whole = size - size % _RECORD.size
+    if whole != size:
+        index.truncate(whole)
+        logger.warning(f"Pack store index: truncated a torn record ({size - whole} bytes)")
+
+
+class _LockedFile:
+    """Opens the index for append+read under an exclusive flock."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __enter__(self):
+        while True:
+            self.f = open(self.path, "a+b")
+            fcntl.flock(self.f, fcntl.LOCK_EX)
+            # A compaction may have replaced the file while we waited.
+            if os.fstat(self.f.fileno()).st_ino == os.stat(self.path).st_ino:
+                return self.f
+            fcntl.flock(self.f, fcntl.LOCK_UN)
+            self.f.close()
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.f, fcntl.LOCK_UN)
+        self.f.close()
+        return False
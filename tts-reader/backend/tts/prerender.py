@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from core.config import PRERENDER_POLL_MS, PRERENDER_RESERVE_SLOTS, PRERENDER_WORKERS
+from core.sentence_index import ensure_sentence_index, sentence_at
+from . import cache as audio_cache
+from .engine import TTS_ENGINE
+from .providers.exceptions import RateLimitedError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class PrerenderJob:
+    """Fills the audio cache for one document, sentence by sentence in reading order."""
+
+    def __init__(self, doc_id: str, total: int):
+        self.doc_id = doc_id
+        self.status = "queued"  # queued | running | done | cancelled | error
+        self.error: Optional[str] = None
+        self.total = total
+        self.processed = 0
+        self.rendered = 0
+        self.already_cached = 0
+        self.failed = 0
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "cancelled", "error")
+
+    def cancel(self) -> None:
+        self._cancel.set()
+        if self.status == "queued":
+            self.status = "cancelled"
+
+    def summary(self) -> dict:
+        return {
+            "doc_id": self.doc_id,
+            "status": self.status,
+            "error": self.error,
+            "total": self.total,
+            "processed": self.processed,
+            "rendered": self.rendered,
+            "already_cached": self.already_cached,
+            "failed": self.failed,
+            "progress": self.processed / self.total if self.total else 1.0,
+        }
+
+
+class PrerenderManager:
+    """
+    Background pre-rendering of whole documents, behind live streaming:
+    each provider call waits until the gateway has no queued work and at
+    least `reserve_slots` free slots, so listeners are never queued behind
+    it. Calls go through the shared TTS engine, so a sentence a listener
+    asks for at the same moment is synthesized once.
+    """
+
+    def __init__(self, engine, workers: int = PRERENDER_WORKERS,
+                 reserve_slots: int = PRERENDER_RESERVE_SLOTS, poll_ms: int = PRERENDER_POLL_MS):
+        self.engine = engine
+        self.reserve_slots = reserve_slots
+        self.poll_s = poll_ms / 1000
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prerender")
+        self._jobs = {}  # doc_id -> latest PrerenderJob
+        self._lock = threading.Lock()
+
+    def submit(self, doc: dict) -> PrerenderJob:
+        """Queues a pre-render of `doc`; returns the running job if there is one."""
+        index = ensure_sentence_index(doc)
+        with self._lock:
+            job = self._jobs.get(doc["doc_id"])
+            if job is not None and not job.finished:
+                return job
+            job = self._jobs[doc["doc_id"]] = PrerenderJob(doc["doc_id"], index["count"])
+        self._executor.submit(self._run, job, doc, index)
+        return job
+
+    def get(self, doc_id: str) -> Optional[PrerenderJob]:
+        with self._lock:
+            return self._jobs.get(doc_id)
+
+    def cancel(self, doc_id: str) -> Optional[PrerenderJob]:
+        job = self.get(doc_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def _run(self, job: PrerenderJob, doc: dict, index: dict) -> None:
+        if job.finished:
+            return
+        job.status = "running"
+        try:
+            self._render(job, doc, index)
+            job.status = "cancelled" if job._cancel.is_set() else "done"
+        except Exception as e:
+            logger.exception(f"Pre-render of {job.doc_id} failed")
+            job.error = str(e)
+            job.status = "error"
+        finally:
+            job.finished_at = time.time()
+        logger.info(f"Pre-render of {job.doc_id} {job.status}: {job.rendered} rendered, "
+                    f"{job.already_cached} already cached, {job.failed} failed")
+
+    def _render(self, job: PrerenderJob, doc: dict, index: dict) -> None:
+        for n in range(index["count"]):
+            if job._cancel.is_set():
+                return
+            text = sentence_at(doc, index, n)["text"]
+            known_ms = audio_cache.duration_ms(text.strip())
+            if known_ms is not None:
+                job.already_cached += 1
+                job.processed += 1
+                continue
+            while not self.engine.gateway.has_capacity(self.reserve_slots):
+                if job._cancel.wait(self.poll_s):
+                    return
+            try:
+                pcm = self.engine.synthesize(text)
+            except RateLimitedError:
+                pcm = None  # the gateway already retried and is cooling down
+            if pcm is not None and pcm.size:
+                job.rendered += 1
+            else:
+                job.failed += 1
+            job.processed += 1
+
+
+PRERENDER = PrerenderManager(TTS_ENGINE)
@@ -0,0 +1,9 @@
+def make_provider(name: str):
+    """Provider by config name; imported lazily so "local" needs no gtts/pydub."""
+    if name == "gtts":
+        from .gtts_provider import GTTSProvider
+        return GTTSProvider()
+    if name == "local":
+        from .local_provider import LocalProvider
+        return LocalProvider()
+    raise ValueError(f"Unknown TTS_PROVIDER {name!r}; expected 'gtts' or 'local'")
@@ -0,0 +1,117 @@
+import hashlib
+import math
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from core.config import (
+    LOCAL_TTS_FAILURE_RATE,
+    LOCAL_TTS_LATENCY_DIST,
+    LOCAL_TTS_LATENCY_MS,
+    LOCAL_TTS_LATENCY_PER_CHAR_MS,
+    LOCAL_TTS_MS_PER_CHAR,
+    LOCAL_TTS_QUOTA_PER_S,
+    LOCAL_TTS_RATE_LIMIT_RATE,
+    LOCAL_TTS_SEED,
+)
+from .base import TTSProvider
+from .exceptions import RateLimitedError
+
+TARGET_SR = 48000
+_FADE = 480  # 10 ms
+_LATENCY_DISTS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+class LocalProvider(TTSProvider):
+    """
+    Offline stand-in for a network TTS service, for load tests.
+    Audio is a voiced tone, a function of the text only (same text, same
+    samples), lasting `ms_per_char` per character. Each call first sleeps a
+    latency drawn from `latency_dist` with mean `latency_ms + latency_per_char_ms
+    * len(text)`, then may fail (`failure_rate`) or raise RateLimitedError
+    (`rate_limit_rate`, or more than `quota_per_s` calls in the last second).
+    Latency and fault draws come from one seeded RNG.
+    """
+
+    def __init__(
+        self,
+        ms_per_char: float = LOCAL_TTS_MS_PER_CHAR,
+        latency_ms: float = LOCAL_TTS_LATENCY_MS,
+        latency_per_char_ms: float = LOCAL_TTS_LATENCY_PER_CHAR_MS,
+        latency_dist: str = LOCAL_TTS_LATENCY_DIST,
+        failure_rate: float = LOCAL_TTS_FAILURE_RATE,
+        rate_limit_rate: float = LOCAL_TTS_RATE_LIMIT_RATE,
+        quota_per_s: float = LOCAL_TTS_QUOTA_PER_S,
+        seed: int = LOCAL_TTS_SEED,
+    ):
+        if latency_dist not in _LATENCY_DISTS:
+            raise ValueError(f"Unknown latency distribution {latency_dist!r}; expected one of {_LATENCY_DISTS}")
+        self.ms_per_char = ms_per_char
+        self.latency_ms = latency_ms
+        self.latency_per_char_ms = latency_per_char_ms
+        self.latency_dist = latency_dist
+        self.failure_rate = failure_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.quota_per_s = quota_per_s
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = deque()  # monotonic times of calls in the last second
+
+    def synth(self, text: str, voice: str = "default") -> np.ndarray:
+        with self._lock:
+            over_quota = self._over_quota()
+            latency_s = self._latency_ms(len(text)) / 1000
+            roll = self._rng.random()
+        if over_quota:
+            raise RateLimitedError(f"429 Too Many Requests (quota {self.quota_per_s:g}/s)")
+        time.sleep(latency_s)
+        if roll < self.rate_limit_rate:
+            raise RateLimitedError("429 Too Many Requests (injected)")
+        if roll < self.rate_limit_rate + self.failure_rate:
+            raise RuntimeError("Local TTS failure (injected)")
+        return synthetic_speech(text, voice, self.ms_per_char)
+
+    def _over_quota(self) -> bool:
+        if self.quota_per_s <= 0:
+            return False
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] >= 1.0:
+            self._recent.popleft()
+        if len(self._recent) >= self.quota_per_s:
+            return True
+        self._recent.append(now)
+        return False
+
+    def _latency_ms(self, chars: int) -> float:
+        mean = self.latency_ms + self.latency_per_char_ms * chars
+        if mean <= 0 or self.latency_dist == "fixed":
+            return max(mean, 0.0)
+        if self.latency_dist == "uniform":
+            return self._rng.uniform(0.0, 2 * mean)
+        if self.latency_dist == "exponential":
+            return self._rng.expovariate(1 / mean)
+        sigma = 0.5  # lognormal with the same mean and a long right tail
+        return self._rng.lognormvariate(math.log(mean) - sigma * sigma / 2, sigma)
+
+
+def synthetic_speech(text: str, voice: str = "default", ms_per_char: float = LOCAL_TTS_MS_PER_CHAR) -> np.ndarray:
+    """PCM16 @ 48k: a pitch set by the text's hash, with ~4 Hz syllable-like amplitude."""
+    n = int(round(len(text) * ms_per_char * TARGET_SR / 1000))
+    if n <= 0:
+        return np.zeros(0, dtype=np.int16)
+    h = int.from_bytes(hashlib.blake2b(f"{voice}\x00{text}".encode("utf-8"), digest_size=8).digest(), "little")
+    f0 = 100.0 + (h % 1200) / 10.0  # 100-220 Hz
+    syllable_hz = 3.0 + (h >> 16) % 300 / 100.0  # 3-6 Hz
+    t = np.arange(n, dtype=np.float32) / TARGET_SR
+    phase = (2 * np.pi * f0) * t
+    wave = np.sin(phase) + 0.5 * np.sin(2 * phase) + 0.25 * np.sin(3 * phase)
+    wave *= 0.55 + 0.45 * np.sin((2 * np.pi * syllable_hz) * t)
+    fade = min(_FADE, n // 2)
+    if fade:
+        ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)
+        wave[:fade] *= ramp
+        wave[n - fade:] *= ramp[::-1]
+    return (wave * 6000).astype(np.int16)
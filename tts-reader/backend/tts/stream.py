@@ -1,9 +1,24 @@
 import asyncio
 import json
 import logging
-from fastapi import WebSocket
+import time
+from fastapi import WebSocket, WebSocketDisconnect
 import numpy as np
 
+from core.config import (
+    STREAM_FLOW_MODE,
+    STREAM_LIVE_POLL_MS,
+    STREAM_PACKET_MAX_MS,
+    STREAM_PACKET_MS,
+    STREAM_PREFETCH_DEPTH,
+    STREAM_PREFETCH_MAX,
+    STREAM_WINDOW_MAX_MS,
+    STREAM_WINDOW_MS,
+)
+from core.metrics import STREAM_BYTES, STREAM_CONNECTIONS, STREAM_PACKETS, STREAM_SENTENCES, STREAM_TTFA_SECONDS
+from core.sentence_index import ensure_sentence_index, locate, sentence_at
+from . import cache as audio_cache
+from .codecs import negotiate
 from .providers.exceptions import RateLimitedError
 
 logging.basicConfig(level=logging.INFO)
@@ -20,104 +35,316 @@ def get_sentences_in_order(doc_data: dict, reading_order: list, start_index: int
         for s_idx, s in enumerate(block.get('sentences', [])):
             yield {"id": f"{block_id}_s{s_idx}", "text": s['text']}
 
+def iter_indexed_sentences(doc_data: dict, index: dict, start: int):
+    """Sentences from global number `start` on, straight off the stored index."""
+    for n in range(start, index["count"]):
+        yield sentence_at(doc_data, index, n)
+
+async def _iter_sentences(sentences):
+    for sentence in sentences:
+        yield sentence
+
+async def iter_live_sentences(doc_data: dict, start_index: int, job):
+    """
+    Like get_sentences_in_order, but for a doc that a parse job is still
+    filling in: when the published reading order runs out, wait for more
+    pages until the job finishes.
+    """
+    blocks = doc_data["blocks"]
+    reading_order = doc_data["reading_order"]
+    blocks_by_id = {}
+    seen_blocks = 0
+    idx = start_index
+    while True:
+        finished = job.finished
+        if idx >= len(reading_order):
+            if finished:
+                return
+            await asyncio.sleep(STREAM_LIVE_POLL_MS / 1000)
+            continue
+
+        block_id = reading_order[idx]
+        idx += 1
+        if block_id not in blocks_by_id:
+            new_blocks = blocks[seen_blocks:]
+            for b in new_blocks:
+                blocks_by_id[b["id"]] = b
+            seen_blocks += len(new_blocks)
+        block = blocks_by_id.get(block_id)
+        if not block or block.get('policy') != 'read':
+            continue
+        for s_idx, s in enumerate(block.get('sentences', [])):
+            yield {"id": f"{block_id}_s{s_idx}", "text": s['text']}
+
 # Canonical server format
 SR = 48000
 FRAME_MS = 20
 SAMPLES_PER_FRAME = SR * FRAME_MS // 1000  # 960
 
-async def stream_sentences(ws: WebSocket, tts_engine, doc_data: dict, config: dict):
+class FlowControl:
+    """
+    Bounds the audio a connection has in flight (sent but not yet played).
+
+    Clients report their playhead with {"type": "ack", "played_ms": ...}
+    (or {"type": "ack", "buffered_ms": ...}). Until the first ack, and for
+    clients that never send one, the playhead is estimated from the wall
+    clock at the playback rate, which paces sending to real time plus the
+    window. Mode "off" disables both (send as fast as synthesis allows).
+    """
+
+    def __init__(self, window_ms: float, mode: str = "auto", rate: float = 1.0):
+        self.window_ms = window_ms
+        self.mode = mode
+        self.rate = rate
+        self.sent_ms = 0.0
+        self.played_ms = 0.0
+        self.acked = False
+        self.closed = False
+        self._changed = asyncio.Event()
+        self._clock = None  # last wall-clock update of the estimated playhead
+
+    def in_flight_ms(self) -> float:
+        return self.sent_ms - self.played_ms
+
+    def on_ack(self, msg: dict) -> None:
+        if "played_ms" in msg:
+            played = float(msg["played_ms"])
+        elif "buffered_ms" in msg:
+            played = self.sent_ms - float(msg["buffered_ms"])
+        else:
+            return
+        self.acked = True
+        self.played_ms = max(self.played_ms, min(played, self.sent_ms))
+        self._changed.set()
+
+    def on_sent(self, ms: float) -> None:
+        self._advance_clock()
+        self.sent_ms += ms
+
+    def close(self) -> None:
+        self.closed = True
+        self._changed.set()
+
+    def _advance_clock(self) -> None:
+        # Paced estimate: playback runs at `rate` while there is audio to play.
+        now = time.monotonic()
+        if self._clock is not None and not self.acked:
+            elapsed_ms = (now - self._clock) * 1000 * max(self.rate, 0.1)
+            self.played_ms = min(self.sent_ms, self.played_ms + elapsed_ms)
+        self._clock = now
+
+    async def wait_for_room(self) -> bool:
+        """Waits until another packet fits in the window. False once closed."""
+        while not self.closed and self.mode != "off":
+            self._advance_clock()
+            excess = self.in_flight_ms() - self.window_ms
+            if excess < 0:
+                break
+            self._changed.clear()
+            timeout = None if self.acked else excess / 1000 / max(self.rate, 0.1)
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return not self.closed
+
+async def stream_sentences(ws: WebSocket, tts_engine, doc_data: dict, config: dict, job=None):
     """
-    Stream audio as binary PCM16 (LE, mono, 48 kHz) in ~20 ms frames + small JSON marks.
+    Stream audio as binary packets of whole 20 ms frames (config["packet_ms"],
+    default STREAM_PACKET_MS) + small JSON marks. The wire codec is negotiated
+    from config["codecs"] (or "codec"), in preference order, and announced in
+    the hello; the default is PCM16 (LE, mono, 48 kHz).
+    At most config["window_ms"] of audio is in flight; see FlowControl.
     The route handler should have already called `await ws.accept()`.
+    Where to start is resolved against the doc's sentence index (see
+    core.sentence_index.locate): "start_sentence", "start_sentence_id",
+    "start_ms" or the block position "start_index".
+    If `job` is an unfinished ParseJob, `doc_data` is its live doc and streaming
+    follows pages as they are published (block positions only).
+    Returns False if the client went away (the socket must not be closed
+    again), True otherwise.
     """
-    reading_order = config.get("reading_order") or doc_data.get("reading_order") or [
-        b["id"] for b in doc_data.get("blocks", []) if b.get("role") in ("title", "heading", "body", "list_item", "quote")
-    ]
-    rate = float(config.get("rate", 1.0))  # client handles tempo; kept for future API
+    started = time.perf_counter()
+    rate = float(config.get("rate", 1.0))  # client handles tempo; only used for pacing
     start_index = int(config.get("start_index", 0))
 
-    gen = get_sentences_in_order(doc_data, reading_order, start_index)
-    loop = asyncio.get_running_loop()
-    seq = 0
+    index = None
+    start_sentence = None
+    offset_ms = 0.0
+    custom_order = config.get("reading_order")
+    if job is not None:
+        gen = iter_live_sentences(doc_data, start_index, job)
+    elif doc_data.get("reading_order") and (not custom_order or custom_order == doc_data["reading_order"]):
+        index = ensure_sentence_index(doc_data)
+        start_sentence, offset_ms = locate(index, config)
+        gen = _iter_sentences(iter_indexed_sentences(doc_data, index, start_sentence))
+    else:
+        # Client-supplied reading order: walk it directly.
+        reading_order = custom_order or [
+            b["id"] for b in doc_data.get("blocks", []) if b.get("role") in ("title", "heading", "body", "list_item", "quote")
+        ]
+        gen = _iter_sentences(get_sentences_in_order(doc_data, reading_order, start_index))
+    codec = negotiate(config.get("codecs") or config.get("codec"))
+    silent = codec.encode(np.zeros(SAMPLES_PER_FRAME, dtype=np.int16))
+    silent_samples = codec.num_samples(silent)
+    silent_ms = silent_samples * 1000 / codec.sample_rate
+    packet_ms = float(config.get("packet_ms", STREAM_PACKET_MS))
+    frames_per_packet = max(1, min(round(packet_ms / FRAME_MS), STREAM_PACKET_MAX_MS // FRAME_MS))
+
+    window_ms = max(frames_per_packet * FRAME_MS, min(float(config.get("window_ms", STREAM_WINDOW_MS)), STREAM_WINDOW_MAX_MS))
+    flow = FlowControl(window_ms, config.get("flow", STREAM_FLOW_MODE), rate)
 
-    # One-time hello (client can log SR)
+    # One-time hello: codec, sample rate and channels for the client decoder
     try:
-        await ws.send_text(json.dumps({"type": "hello", "sample_rate": SR}))
+        await ws.send_text(json.dumps({
+            "type": "hello",
+            **codec.hello(),
+            "packet_ms": frames_per_packet * FRAME_MS,
+            "window_ms": window_ms,
+            **({"start_sentence": start_sentence, "sentences": index["count"]} if index else {}),
+        }))
     except Exception:
         pass
 
-    for sentence in gen:
+    async def read_control():
+        # Acks and control messages arrive while audio is being sent.
         try:
-            # Non-blocking control read (future use)
-            try:
-                msg = await asyncio.wait_for(ws.receive_json(), timeout=0.0)
-                if msg.get("type") == "control" and "rate" in msg:
-                    rate = float(msg["rate"])
-                    logger.info(f"Updated (unused) server rate → {rate}")
-            except asyncio.TimeoutError:
-                pass
-            except Exception:
-                pass
+            while True:
+                try:
+                    msg = await ws.receive_json()
+                except (ValueError, KeyError, TypeError):
+                    continue  # not JSON text
+                if msg.get("type") == "ack":
+                    flow.on_ack(msg)
+                elif msg.get("type") == "control" and "rate" in msg:
+                    flow.rate = float(msg["rate"])
+                    logger.info(f"Updated server pacing rate → {flow.rate}")
+        except Exception:
+            pass
+        finally:
+            flow.close()
+
+    # The sentence being streamed plus up to `depth` upcoming ones synthesize
+    # concurrently; the semaphore caps audio buffered per connection.
+    depth = max(1, min(int(config.get("prefetch", STREAM_PREFETCH_DEPTH)), STREAM_PREFETCH_MAX))
+    slots = asyncio.Semaphore(depth + 1)
+    pending = asyncio.Queue()
+
+    async def prefetch():
+        try:
+            async for sentence in gen:
+                await slots.acquire()
+                # Provider calls run on the TTS gateway's executor; the loop only awaits
+                synth = asyncio.ensure_future(tts_engine.asynthesize_encoded(sentence["text"], codec, rate))
+                pending.put_nowait((sentence, synth))
+        finally:
+            pending.put_nowait(None)
 
-            # Synthesize off-thread to keep WS loop snappy
+    producer = asyncio.create_task(prefetch())
+    reader = asyncio.create_task(read_control())
+    STREAM_CONNECTIONS.inc()
+    try:
+        seq = 0
+        awaiting_first_audio = True
+        while True:
+            item = await pending.get()
+            if item is None:
+                break
+            sentence, synth = item
+            skip_ms, offset_ms = offset_ms, 0.0  # time seeks trim the first sentence only
             try:
-                audio_data: np.ndarray = await loop.run_in_executor(
-                    None, tts_engine.synthesize, sentence["text"], rate
-                )
-            except RateLimitedError:
-                # Graceful fallback on 429: short silence + explicit mark
-                silent = np.zeros(SAMPLES_PER_FRAME, dtype=np.int16)
-                await ws.send_bytes(silent.tobytes())
-                await ws.send_text(json.dumps({
-                    "type": "mark",
-                    "sentence_id": sentence["id"],
-                    "status": "rate_limited",
-                    "seq": seq,
-                    "sample_rate": SR,
-                    "num_samples": int(silent.size),
-                }))
-                seq += 1
-                await asyncio.sleep(0)
-                continue
+                try:
+                    audio_data: np.ndarray = await synth
+                except RateLimitedError:
+                    # Graceful fallback on 429: short silence + explicit mark
+                    await ws.send_bytes(silent.tobytes())
+                    flow.on_sent(silent_ms)
+                    STREAM_SENTENCES.inc(status="rate_limited")
+                    await ws.send_text(json.dumps({
+                        "type": "mark",
+                        "sentence_id": sentence["id"],
+                        "status": "rate_limited",
+                        "seq": seq,
+                        "index": sentence.get("index"),
+                        "sample_rate": codec.sample_rate,
+                        "num_samples": silent_samples,
+                    }))
+                    seq += 1
+                    await asyncio.sleep(0)
+                    continue
+
+                if audio_data is None or audio_data.size == 0:
+                    # Keep timing smooth with a minimal silent frame
+                    await ws.send_bytes(silent.tobytes())
+                    flow.on_sent(silent_ms)
+                    STREAM_SENTENCES.inc(status="empty")
+                    await ws.send_text(json.dumps({
+                        "type": "mark",
+                        "sentence_id": sentence["id"],
+                        "status": "empty",
+                        "seq": seq,
+                        "index": sentence.get("index"),
+                        "sample_rate": codec.sample_rate,
+                        "num_samples": silent_samples,
+                    }))
+                    seq += 1
+                    await asyncio.sleep(0)
+                    continue
+
+                if skip_ms:
+                    audio_data = codec.skip(audio_data, skip_ms)
+
+                # Send packets as memoryviews straight out of the (cached) array
+                total = codec.num_samples(audio_data)
+                packets = sent_bytes = 0
+                for packet in codec.frames(audio_data, frames_per_packet):
+                    if not await flow.wait_for_room():
+                        break
+                    await ws.send_bytes(packet)
+                    if awaiting_first_audio:
+                        STREAM_TTFA_SECONDS.observe(time.perf_counter() - started)
+                        awaiting_first_audio = False
+                    flow.on_sent(codec.num_samples(packet) * 1000 / codec.sample_rate)
+                    packets += 1
+                    sent_bytes += packet.nbytes
+                STREAM_PACKETS.inc(packets, codec=codec.name)
+                STREAM_BYTES.inc(sent_bytes, codec=codec.name)
+                if flow.closed:
+                    break
 
-            if audio_data is None or audio_data.size == 0:
-                # Keep timing smooth with a minimal silent frame
-                silent = np.zeros(SAMPLES_PER_FRAME, dtype=np.int16)
-                await ws.send_bytes(silent.tobytes())
                 await ws.send_text(json.dumps({
                     "type": "mark",
                     "sentence_id": sentence["id"],
-                    "status": "empty",
+                    "status": "done",
                     "seq": seq,
-                    "sample_rate": SR,
-                    "num_samples": int(silent.size),
+                    "index": sentence.get("index"),
+                    "sample_rate": codec.sample_rate,
+                    "num_samples": total,
                 }))
+                STREAM_SENTENCES.inc(status="done")
                 seq += 1
+
                 await asyncio.sleep(0)
-                continue
-
-            # Chunk into ~20 ms frames and stream
-            total = int(audio_data.size)
-            for i in range(0, total, SAMPLES_PER_FRAME):
-                frame = audio_data[i:i + SAMPLES_PER_FRAME]
-                await ws.send_bytes(frame.tobytes())
-                # Optional: near-real-time pacing
-                # await asyncio.sleep(FRAME_MS / 1000)
-
-            await ws.send_text(json.dumps({
-                "type": "mark",
-                "sentence_id": sentence["id"],
-                "status": "done",
-                "seq": seq,
-                "sample_rate": SR,
-                "num_samples": total,
-            }))
-            seq += 1
-
-            await asyncio.sleep(0)
-
-        except Exception as e:
-            logger.error(f"Error during sentence streaming: {e}")
-            break
+
+            except WebSocketDisconnect:
+                flow.close()  # a send found the client gone
+                break
+            except Exception as e:
+                logger.error(f"Error during sentence streaming: {e}")
+                break
+            finally:
+                slots.release()
+    finally:
+        STREAM_CONNECTIONS.dec()
+        client_gone = flow.closed  # before cancelling the reader closes it too
+        # Socket closed or streaming finished: drop any buffered synthesis.
+        producer.cancel()
+        reader.cancel()
+        while not pending.empty():
+            item = pending.get_nowait()
+            if item is not None:
+                item[1].cancel()
+        await asyncio.gather(producer, reader, return_exceptions=True)
 
     logger.info("Finished streaming sentences.")
+    return not client_gone
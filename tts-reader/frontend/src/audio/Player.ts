@@ -51,6 +51,20 @@ function linearResampleMono(
   return out;
 }
 
+const MULAW_TABLE = (() => {
+  const t = new Float32Array(256);
+  for (let i = 0; i < 256; i++) {
+    const u = ~i & 0xff;
+    const exponent = (u >> 4) & 0x07;
+    const mantissa = u & 0x0f;
+    const x = (((mantissa << 3) + 0x84) << exponent) - 0x84;
+    t[i] = (u & 0x80 ? -x : x) / 32768;
+  }
+  return t;
+})();
+
+const RING_SECONDS = 4;
+
 class Player {
   private audioContext: AudioContext;
   private soundtouch: SoundTouch;
@@ -59,6 +73,7 @@ class Player {
   private ring: FloatRingBuffer;
   public isPlaying = false;
   private inputSampleRate = 22050; // server PCM rate
+  private consumed = 0; // samples (at ctxRate) pulled from the ring
 
   constructor() {
     this.audioContext = new AudioContext(); // Browser default 44100/48000
@@ -69,7 +84,7 @@ class Player {
     const self = this;
     const source = {
       extract(target: Float32Array, numFrames: number) {
-        self.ring.read(target);
+        self.consumed += self.ring.read(target);
         return numFrames;
       }
     };
@@ -79,13 +94,33 @@ class Player {
     this.node = getWebAudioNode(this.audioContext, this.filter);
     this.node.connect(this.audioContext.destination);
 
-    // ~2 seconds of buffer at ctxRate
-    this.ring = new FloatRingBuffer(Math.ceil(ctxRate * 2));
+    // Buffer at ctxRate; must exceed the server's flow-control window
+    this.ring = new FloatRingBuffer(Math.ceil(ctxRate * RING_SECONDS));
+  }
+
+  // Milliseconds of stream audio played so far (the server's flow-control playhead)
+  playedMs() {
+    return (this.consumed / this.audioContext.sampleRate) * 1000;
+  }
+
+  setInputSampleRate(rate: number) {
+    this.inputSampleRate = rate;
   }
 
   addChunkPCM16(int16: Int16Array) {
     const f = new Float32Array(int16.length);
     for (let i = 0; i < int16.length; i++) f[i] = int16[i] / 32768;
+    this.addChunkFloat(f);
+  }
+
+  // G.711 mu-law bytes (server codec "mulaw_24k"/"mulaw_16k")
+  addChunkMulaw(bytes: Uint8Array) {
+    const f = new Float32Array(bytes.length);
+    for (let i = 0; i < bytes.length; i++) f[i] = MULAW_TABLE[bytes[i]];
+    this.addChunkFloat(f);
+  }
+
+  private addChunkFloat(f: Float32Array) {
     const ctxRate = this.audioContext.sampleRate;
     const fResampled = linearResampleMono(f, this.inputSampleRate, ctxRate);
     this.ring.write(fResampled);
@@ -6,6 +6,11 @@ interface ReaderProps { doc: any; }
 // Keep control-to-server off to avoid accidental double-speed.
 // Client handles tempo (pitch-preserving).
 const CONTROL_TO_SERVER = false;
+// Wire codecs this client decodes, in preference order (server picks the first it supports)
+const SUPPORTED_CODECS = ['mulaw_24k', 'pcm16'];
+// Audio the server may have in flight; keep below the Player's ring buffer
+const WINDOW_MS = 2000;
+const ACK_INTERVAL_MS = 250;
 
 const Reader: React.FC<ReaderProps> = ({ doc }) => {
   const [tempo, setTempo] = useState(1.0);
@@ -18,6 +23,8 @@ const Reader: React.FC<ReaderProps> = ({ doc }) => {
   const connectingRef = useRef(false);
   const destroyedRef = useRef(false);
   const serverSampleRateRef = useRef<number | null>(null);
+  const codecRef = useRef<string>('pcm16');
+  const ackTimerRef = useRef<number | null>(null);
 
   // 1) Create Player exactly once (don’t tear down on dev StrictMode unmount)
   useEffect(() => {
@@ -69,8 +76,18 @@ const Reader: React.FC<ReaderProps> = ({ doc }) => {
             type: 'doc',
             doc_id: doc.doc_id,
             reading_order: doc.reading_order,
-            start_index: 0
+            start_index: 0,
+            codecs: SUPPORTED_CODECS,
+            window_ms: WINDOW_MS
           }));
+          // Playhead acks are relative to this connection's first audio
+          const playedAtOpen = playerRef.current?.playedMs() ?? 0;
+          ackTimerRef.current = window.setInterval(() => {
+            const player = playerRef.current;
+            if (player && ws.readyState === WebSocket.OPEN) {
+              ws.send(JSON.stringify({ type: 'ack', played_ms: player.playedMs() - playedAtOpen }));
+            }
+          }, ACK_INTERVAL_MS);
           if (CONTROL_TO_SERVER) {
             ws.send(JSON.stringify({ type: 'control', rate: tempo }));
           }
@@ -93,6 +110,7 @@ const Reader: React.FC<ReaderProps> = ({ doc }) => {
               }
             }
             if (msg.type === 'hello' && typeof msg.sample_rate === 'number') {
+              codecRef.current = msg.codec ?? 'pcm16';
               serverSampleRateRef.current = msg.sample_rate;
               (playerRef.current as any)?.setInputSampleRate?.(msg.sample_rate);
             }
@@ -100,11 +118,13 @@ const Reader: React.FC<ReaderProps> = ({ doc }) => {
           return;
         }
 
-        // Binary PCM16 (LE), mono — streamed in ~20 ms frames
+        // Binary audio, mono, in the codec announced by the hello
         if (data instanceof ArrayBuffer) {
-          const pcm16 = new Int16Array(data);
-          // @ts-ignore Player has addChunkPCM16
-          playerRef.current?.addChunkPCM16(pcm16);
+          if (codecRef.current.startsWith('mulaw')) {
+            playerRef.current?.addChunkMulaw(new Uint8Array(data));
+          } else {
+            playerRef.current?.addChunkPCM16(new Int16Array(data));
+          }
           if (isPlaying) playerRef.current?.play();
         }
       };
@@ -117,6 +137,10 @@ const Reader: React.FC<ReaderProps> = ({ doc }) => {
         console.log('WS closed', e.code, e.reason || '');
         wsRef.current = null;
         connectingRef.current = false;
+        if (ackTimerRef.current) {
+          window.clearInterval(ackTimerRef.current);
+          ackTimerRef.current = null;
+        }
         if (!destroyedRef.current) {
           if (reconnectTimerRef.current) window.clearTimeout(reconnectTimerRef.current);
           reconnectTimerRef.current = window.setTimeout(ensureWS, 800);
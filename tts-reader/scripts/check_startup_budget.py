@@ -0,0 +1,91 @@
+"""
+Startup budget check for the backend: import time, idle RSS, and no heavy
+parse/TTS dependencies (or model downloads) on the import path.
+
+    python scripts/check_startup_budget.py [--runs 5] [--max-import-s 1.5] [--max-rss-mb 120]
+
+Each run imports `app` in a fresh interpreter (from tts-reader/backend, with
+STARTUP_WARMUP unset), then reports the import wall time, the resident set
+size after import, and which of the lazily loaded modules got imported
+anyway. The median import time and the largest RSS are checked against the
+budgets; the exit status is 1 if a budget is exceeded or a lazy module was
+imported at startup. backend/tests/test_startup_budget.py runs the same
+check under pytest.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+MAX_IMPORT_S = 1.5
+MAX_RSS_MB = 120.0
+
+# Must only load on first use (or via STARTUP_WARMUP).
+LAZY_MODULES = ("spacy", "fitz", "sklearn", "pdfminer", "gtts", "pydub", "paddleocr", "PIL")
+
+_PROBE = f"""
+import json, sys, time
+t0 = time.perf_counter()
+import app
+import_s = time.perf_counter() - t0
+with open("/proc/self/status") as f:
+    rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+print(json.dumps({{
+    "import_s": import_s,
+    "rss_mb": rss_kb / 1024,
+    "lazy_loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure() -> dict:
+    env = {k: v for k, v in os.environ.items() if k != "STARTUP_WARMUP"}
+    out = subprocess.run([sys.executable, "-c", _PROBE], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def check(runs: int = 5, max_import_s: float = MAX_IMPORT_S, max_rss_mb: float = MAX_RSS_MB):
+    """Measures `runs` fresh imports; returns (summary dict, list of failure messages)."""
+    measure()  # first run warms the OS page cache and .pyc files
+    results = [measure() for _ in range(runs)]
+    summary = {
+        "import_s": statistics.median(r["import_s"] for r in results),
+        "rss_mb": max(r["rss_mb"] for r in results),
+        "lazy_loaded": sorted({m for r in results for m in r["lazy_loaded"]}),
+    }
+    failures = []
+    if summary["import_s"] > max_import_s:
+        failures.append(f"import time {summary['import_s']:.3f}s exceeds {max_import_s}s")
+    if summary["rss_mb"] > max_rss_mb:
+        failures.append(f"idle RSS {summary['rss_mb']:.1f} MB exceeds {max_rss_mb} MB")
+    if summary["lazy_loaded"]:
+        failures.append(f"imported at startup: {', '.join(summary['lazy_loaded'])}")
+    return summary, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check backend startup time and idle memory budgets.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-s", type=float, default=MAX_IMPORT_S, help="Budget for median `import app` time.")
+    parser.add_argument("--max-rss-mb", type=float, default=MAX_RSS_MB, help="Budget for RSS after import.")
+    args = parser.parse_args()
+
+    summary, failures = check(args.runs, args.max_import_s, args.max_rss_mb)
+    print(f"import app: median {summary['import_s']:.3f}s (budget {args.max_import_s}s)")
+    print(f"idle RSS:   max {summary['rss_mb']:.1f} MB (budget {args.max_rss_mb} MB)")
+    print(f"lazy modules imported at startup: {summary['lazy_loaded'] or 'none'}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()